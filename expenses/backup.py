@@ -0,0 +1,227 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Account export and restore.
+
+An export is a zip archive with one JSON Lines file per model (categories,
+expenses, bill items, templates and deletion records), and a manifest. It is
+written as a stream: rows are read in chunks with ``values()``, and the
+archive is produced as it is written, so memory use does not depend on the
+size of the account. Values are serialized with the functions used by the
+sync API.
+
+A restore adds the contents of an archive to an empty account with
+``bulk_create``. Objects get new IDs, and references between them are
+remapped. Deletion records are not restored, as they refer to objects by
+their old IDs.
+"""
+
+import datetime
+import decimal
+import io
+import json
+import typing
+import zipfile
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from expenses.caching import batch_data_version_bumps, bump_data_version
+from expenses.category_registry import invalidate_category_registry
+from expenses.utils import parse_date, parse_decimal, parse_dt, serialize_date, serialize_decimal, serialize_dt
+
+FORMAT_NAME = "django-expenses-export"
+FORMAT_VERSION = 1
+CHUNK_SIZE = 2000
+
+
+class RestoreError(ValueError):
+    """Raised when an archive cannot be restored."""
+
+
+def _models() -> typing.List[typing.Tuple[str, typing.Any]]:
+    """Get the exported models, in restore order."""
+    from expenses.models import BillItem, Category, DeletionRecord, Expense, ExpenseTemplate
+
+    return [
+        ("category", Category),
+        ("expense", Expense),
+        ("billitem", BillItem),
+        ("expensetemplate", ExpenseTemplate),
+        ("deletionrecord", DeletionRecord),
+    ]
+
+
+def _fields(model) -> typing.List[typing.Any]:
+    return [f for f in model._meta.concrete_fields if f.name != "user"]
+
+
+def _serialize(value):
+    if isinstance(value, datetime.datetime):
+        return serialize_dt(value)
+    elif isinstance(value, datetime.date):
+        return serialize_date(value)
+    elif isinstance(value, decimal.Decimal):
+        return serialize_decimal(value)
+    return value
+
+
+PARSERS = {"DateTimeField": parse_dt, "DateField": parse_date, "DecimalField": parse_decimal}
+# Foreign keys to remap: {model: {attname: referenced model}}
+REFERENCES = {
+    "expense": {"category_id": "category"},
+    "billitem": {"bill_id": "expense"},
+    "expensetemplate": {"category_id": "category"},
+}
+
+
+class _StreamBuffer(io.RawIOBase):
+    """A write-only, unseekable file that collects what is written to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _chunked_values(queryset, names: typing.List[str], chunk_size: int) -> typing.Iterator[typing.List[dict]]:
+    """Iterate over the rows of a queryset in chunks, by primary key."""
+    last_pk = None
+    while True:
+        chunk_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk_qs.order_by("pk").values(*names)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1]["id"]
+
+
+def export_archive(user, chunk_size: int = CHUNK_SIZE) -> typing.Iterator[bytes]:
+    """Export all data of a user as a zip archive, yielding it in parts."""
+    buffer = _StreamBuffer()
+    counts = {}
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, model in _models():
+            names = [f.attname for f in _fields(model)]
+            counts[name] = 0
+            with archive.open(f"{name}.jsonl", "w", force_zip64=True) as fh:
+                for rows in _chunked_values(model.objects.filter(user=user), names, chunk_size):
+                    lines = (json.dumps({k: _serialize(v) for k, v in row.items()}, ensure_ascii=False) for row in rows)
+                    fh.write(("\n".join(lines) + "\n").encode("utf-8"))
+                    counts[name] += len(rows)
+                    yield buffer.pop()
+        manifest = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "date": serialize_dt(timezone.now()),
+            "counts": counts,
+        }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    yield buffer.pop()
+
+
+def _read_rows(archive: zipfile.ZipFile, name: str, model) -> typing.Iterator[dict]:
+    parsers = {f.attname: PARSERS.get(f.get_internal_type()) for f in _fields(model)}
+    with io.TextIOWrapper(archive.open(f"{name}.jsonl"), encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            for key, value in row.items():
+                parser = parsers.get(key)
+                if parser is not None and value is not None:
+                    row[key] = parser(value)
+            yield row
+
+
+def _restore_model(
+    user,
+    archive: zipfile.ZipFile,
+    name: str,
+    model,
+    remap: typing.Dict[str, dict],
+    keep_ids: typing.Callable[[typing.Any], bool],
+    chunk_size: int,
+) -> typing.Tuple[typing.Dict[int, int], int]:
+    """Restore the objects of a model. Returns the new IDs of kept objects and the number of restored objects."""
+    fk_maps = {attname: remap[target] for attname, target in REFERENCES.get(name, {}).items()}
+    new_ids = {}
+    created = 0
+    chunk = []
+
+    def flush():
+        nonlocal created
+        old_ids = [row.pop("id") for row in chunk]
+        timestamps = [(row["date_added"], row["date_modified"]) for row in chunk]
+        objs = model.objects.bulk_create([model(user=user, **row) for row in chunk])
+        # bulk_create sets the automatic timestamps to now, bulk_update does not.
+        for obj, (date_added, date_modified) in zip(objs, timestamps):
+            obj.date_added = date_added
+            obj.date_modified = date_modified
+        model.objects.bulk_update(objs, ["date_added", "date_modified"], batch_size=chunk_size)
+        for old_id, obj in zip(old_ids, objs):
+            if keep_ids(obj):
+                new_ids[old_id] = obj.pk
+        created += len(objs)
+        chunk.clear()
+
+    for row in _read_rows(archive, name, model):
+        try:
+            for attname, id_map in fk_maps.items():
+                row[attname] = id_map[row[attname]]
+        except KeyError:
+            # Refers to an object that is not in the archive (changed during the export)
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return new_ids, created
+
+
+def restore_archive(user, file: typing.BinaryIO, chunk_size: int = CHUNK_SIZE) -> typing.Dict[str, int]:
+    """Restore an archive into an empty account. Returns the number of restored objects of each model.
+
+    Raises RestoreError if the archive is invalid or the account is not empty.
+    """
+    from expenses.models import Category, Expense, ExpenseTemplate
+
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise RestoreError("Restoring requires a database that returns IDs from bulk inserts.")
+    try:
+        archive = zipfile.ZipFile(file)
+        manifest = json.loads(archive.read("manifest.json"))
+    except (zipfile.BadZipFile, KeyError, ValueError):
+        raise RestoreError("Not an Expenses export.")
+    if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+        raise RestoreError("Unsupported export format.")
+
+    counts = {}
+    with transaction.atomic(), batch_data_version_bumps():
+        for model in (Category, Expense, ExpenseTemplate):
+            if model.objects.filter(user=user).exists():
+                raise RestoreError("The account is not empty.")
+        remap = {}
+        for name, model in _models():
+            if name == "deletionrecord":
+                continue
+            # Only bills are referenced by other objects, so other expense IDs are not kept.
+            keep_ids = (lambda obj: obj.is_bill) if name == "expense" else (lambda obj: True)
+            remap[name], counts[name] = _restore_model(user, archive, name, model, remap, keep_ids, chunk_size)
+        bump_data_version(user.pk)
+    invalidate_category_registry(user.pk, user)
+    return counts
@@ -0,0 +1,516 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Benchmarks for performance-sensitive parts of Expenses.
+
+Every benchmark returns a dict of results, which the ``expenses_benchmark``
+management command prints and optionally saves as JSON.
+"""
+
+import datetime
+import decimal
+import random
+import time
+import typing
+
+BENCHMARKS: typing.Dict[str, typing.Callable[..., dict]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark."""
+
+    def wrap(f):
+        BENCHMARKS[name] = f
+        return f
+
+    return wrap
+
+
+class Timer:
+    """Measure wall time of a block of code."""
+
+    def __init__(self):
+        self.elapsed = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+
+
+@benchmark("formatting")
+def benchmark_formatting(rows: int = 120, **kwargs) -> dict:
+    """Measure per-cell formatting cost on a large Month/Category breakdown.
+
+    ``rows`` is the number of months in the report (with 15 categories each).
+    """
+    import babel.dates
+    import babel.numbers
+    from django.conf import settings
+    from django.utils import translation
+
+    from expenses.category_registry import CategoryRegistry
+    from expenses.models import Category
+    from expenses.reports import MonthCategoryBreakdown
+    from expenses.utils import format_money, get_babel_locale
+
+    categories = [Category(pk=n, name=f"Category {n}", slug=f"category-{n}", order=n) for n in range(1, 16)]
+    start = datetime.date.today().replace(day=1)
+    results = []
+    for month in range(rows):
+        year, month_idx = divmod(start.year * 12 + start.month - 1 - month, 12)
+        yearmonth = f"{year:04}-{month_idx + 1:02}"
+        results.extend((yearmonth, c.pk, decimal.Decimal(c.pk * 1000 + month).scaleb(-2)) for c in categories)
+    results.sort(key=lambda r: r[0])
+    amounts = [r[2] for r in results]
+    months = sorted({r[0] for r in results})
+
+    with translation.override(settings.LANGUAGE_CODE):
+        with Timer() as babel_money_time:
+            for amount in amounts:
+                babel.numbers.format_currency(
+                    amount, settings.EXPENSES_CURRENCY_CODE, locale=settings.EXPENSES_CURRENCY_LOCALE
+                )
+        with Timer() as cached_money_time:
+            for amount in amounts:
+                format_money(amount)
+
+        with Timer() as babel_month_time:
+            for yearmonth in months:
+                year, month = map(int, yearmonth.split("-"))
+                babel.dates.format_skeleton("yMMMM", datetime.date(year, month, 1), locale=get_babel_locale())
+
+        month_category_option = MonthCategoryBreakdown.options[0][0]
+        report = MonthCategoryBreakdown(
+            None, {month_category_option: True}, categories, CategoryRegistry(categories)
+        )
+        with Timer() as report_time:
+            output = list(report.preprocess_rows(results))
+
+    cells = sum(len(row) for row in output)
+    return {
+        "cells": cells,
+        "babel_money_us_per_cell": babel_money_time.elapsed / len(amounts) * 1e6,
+        "cached_money_us_per_cell": cached_money_time.elapsed / len(amounts) * 1e6,
+        "babel_month_us_per_row": babel_month_time.elapsed / len(months) * 1e6,
+        "report_us_per_cell": report_time.elapsed / cells * 1e6,
+    }
+
+
+def _time_import(module: str, preload: str = "", repeat: int = 5) -> typing.Optional[float]:
+    """Measure the best time of importing a module in a fresh interpreter, or None if it cannot be imported.
+
+    Modules in preload are imported first, and not counted.
+    """
+    import os
+    import subprocess
+    import sys
+
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    if preload:
+        code = f"import {preload}; {code}"
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-c", code], cwd=package_root, capture_output=True, text=True)
+        if process.returncode != 0:
+            return None
+        times.append(float(process.stdout))
+    return min(times)
+
+
+@benchmark("charts")
+def benchmark_charts(rows: int = 120, repeat: int = 20, **kwargs) -> dict:
+    """Measure chart cold-start (import) and per-render costs, for the built-in renderer and pygal.
+
+    ``rows`` is the number of months in the bar chart (with 12 categories each).
+    The pie chart has 12 slices.
+    """
+    from django.test import override_settings
+
+    from expenses import charts
+
+    rng = random.Random(0)
+    names = [f"Category {n}" for n in range(1, 13)]
+    pie_data = [(name, decimal.Decimal(rng.randrange(100, 500000)).scaleb(-2)) for name in names]
+    months = [f"Month {n}" for n in range(rows)]
+    series = [(name, [decimal.Decimal(rng.randrange(0, 50000)).scaleb(-2) for _ in months]) for name in names]
+
+    def time_renders(renderer: str) -> dict:
+        with override_settings(EXPENSES_CHART_RENDERER=renderer):
+            with Timer() as pie_time:
+                for _ in range(repeat):
+                    charts.render_pie_chart(pie_data)
+            with Timer() as bar_time:
+                for _ in range(repeat):
+                    charts.render_bar_chart(months, series, stacked=True)
+        return {"pie_ms": pie_time.elapsed / repeat * 1000, "stacked_bar_ms": bar_time.elapsed / repeat * 1000}
+
+    # Only count what the renderers add to modules every worker loads anyway.
+    base_modules = "expenses.utils, django.utils.html"
+    results = {
+        "import_builtin_seconds": _time_import("expenses.charts", base_modules),
+        "import_pygal_seconds": _time_import("pygal, pygal.style", base_modules),
+        "builtin": time_renders("builtin"),
+    }
+    try:
+        import pygal  # NOQA
+    except ImportError:
+        pass
+    else:
+        results["pygal"] = time_renders("pygal")
+    return results
+
+
+# Import-time budget of expenses.urls, in milliseconds (checked by tests and expenses_check_imports)
+URLS_IMPORT_BUDGET_MS = 50
+
+
+def measure_import_time(module: str = "expenses.urls", top: int = 15) -> dict:
+    """Measure the import of a module with ``python -X importtime``.
+
+    The module is imported in a fresh process, after Django is set up with the
+    current settings. Returns its total import time and the modules it
+    imported that took the most time by themselves.
+    """
+    import os
+    import subprocess
+    import sys
+
+    code = f"import django; django.setup(); import {module}"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1]}
+
+    # Lines look like "import time: self | cumulative | <indent>name", in microseconds, with nested
+    # imports listed (and indented more) before the module that imported them.
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        indent = len(name) - len(name.lstrip())
+        entries.append((name.strip(), indent, int(self_us), int(cumulative_us)))
+
+    for index in range(len(entries) - 1, -1, -1):
+        if entries[index][0] == module:
+            break
+    else:
+        return {"seconds": 0.0, "slowest": {}}
+    _name, indent, _self_us, cumulative_us = entries[index]
+    nested = []
+    for entry in reversed(entries[:index]):
+        if entry[1] <= indent:
+            break
+        nested.append(entry)
+    nested.sort(key=lambda e: e[2], reverse=True)
+    return {
+        "seconds": cumulative_us / 1e6,
+        "slowest": {name: self_us / 1e6 for name, _indent, self_us, _cumulative_us in nested[:top]},
+    }
+
+
+@benchmark("imports")
+def benchmark_imports(**kwargs) -> dict:
+    """Measure the import time of expenses.urls, and the slowest modules it imports."""
+    return measure_import_time("expenses.urls")
+
+
+def _find_user(user: typing.Optional[str]):
+    """Find a user by username, or the first user with expenses."""
+    from django.contrib.auth import get_user_model
+
+    user_model = get_user_model()
+    if user is None:
+        return user_model.objects.filter(expense__isnull=False).distinct().first()
+    return user_model.objects.filter(**{user_model.USERNAME_FIELD: user}).first()
+
+
+@benchmark("expense_table")
+def benchmark_expense_table(rows: int = 100, user: str = None, repeat: int = 20, **kwargs) -> dict:
+    """Measure rendering of an expense table page, with and without cached fragments.
+
+    ``rows`` is the number of expenses on the page.
+    """
+    from django.conf import settings
+    from django.test import override_settings
+    from django.utils import translation
+
+    from expenses.caching import bump_data_version
+    from expenses.keyset import EXPENSE_ORDERING
+    from expenses.models import Expense
+    from expenses.templatetags.expenses_extras import render_expense_rows
+
+    user_obj = _find_user(user)
+    if user_obj is None:
+        return {"error": "No user with expenses found. Run expenses_generate_data first."}
+    expenses = list(Expense.objects.filter(user=user_obj).order_by(*EXPENSE_ORDERING)[:rows])
+
+    def time_render(before=None) -> float:
+        times = []
+        for _ in range(repeat):
+            if before is not None:
+                before()
+            with Timer() as timer:
+                render_expense_rows(expenses, user_obj, True)
+            times.append(timer.elapsed)
+        return min(times) * 1000
+
+    with translation.override(settings.LANGUAGE_CODE):
+        with override_settings(EXPENSES_FRAGMENT_CACHE=False):
+            uncached = time_render()
+        render_expense_rows(expenses, user_obj, True)
+        # A new data version makes the page miss, but its rows are still cached.
+        rows_cached = time_render(lambda: bump_data_version(user_obj.pk))
+        page_cached = time_render()
+
+    return {
+        "user": user_obj.get_username(),
+        "rows": len(expenses),
+        "uncached_ms": uncached,
+        "rows_cached_ms": rows_cached,
+        "page_cached_ms": page_cached,
+    }
+
+
+def _time_request(client, method: str, url: str, data: dict, repeat: int) -> dict:
+    """Time a request made with a test client, counting its queries."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    times = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+            response = getattr(client, method)(url, data)
+        times.append(timer.elapsed)
+    times.sort()
+    return {
+        "status": response.status_code,
+        "queries": len(queries),
+        "min_seconds": times[0],
+        "median_seconds": times[len(times) // 2],
+    }
+
+
+def _time_call(f, repeat: int) -> dict:
+    """Time a function call, counting its queries."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    times = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+            f()
+        times.append(timer.elapsed)
+    times.sort()
+    return {"queries": len(queries), "min_seconds": times[0], "median_seconds": times[len(times) // 2]}
+
+
+def _report_default_data(report_class) -> dict:
+    """Build setup form data with the default choice of every option group."""
+    data = {}
+    for group in report_class.options:
+        if group.type == "radio":
+            data[group.option_id] = group.options[0].option_id
+        else:
+            for option in group.options:
+                if getattr(option, "default", False):
+                    data[option.option_id] = "on"
+                elif option.type == "text":
+                    data[option.option_id] = ""
+    return data
+
+
+def _benchmark_sync(user, repeat: int) -> dict:
+    """Time initial and delta sync, bypassing OAuth."""
+    import datetime as dt
+
+    from django.test import RequestFactory
+    from django.utils import timezone
+
+    try:
+        from expenses.views.api_sync import RunEndpoint
+    except ImportError:
+        return {}
+
+    request = RequestFactory().post("/")
+    request.user = user
+    endpoint = RunEndpoint()
+    now = timezone.now()
+    last_sync = now - dt.timedelta(days=30)
+    return {
+        "sync_initial": _time_call(
+            lambda: endpoint.get_response(request, {"last_sync": None, "sync_date": now.isoformat()}), repeat
+        ),
+        "sync_delta": _time_call(
+            lambda: endpoint.get_response(
+                request, {"last_sync": last_sync.isoformat(), "sync_date": now.isoformat()}
+            ),
+            repeat,
+        ),
+    }
+
+
+@benchmark("views")
+def benchmark_views(user: str = None, repeat: int = 5, **kwargs) -> dict:
+    """Time the main views, reports, autocomplete and sync for a user.
+
+    Use ``expenses_generate_data`` to create a user with enough data first.
+    """
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from django.urls import reverse
+
+    from expenses.models import Expense
+    from expenses.reports import AVAILABLE_REPORTS
+
+    user_obj = _find_user(user)
+    if user_obj is None:
+        return {"error": "No user with expenses found. Run expenses_generate_data first."}
+
+    expense_count = Expense.objects.filter(user=user_obj).count()
+    sample = Expense.objects.filter(user=user_obj, is_bill=True).values_list("vendor", flat=True).first() or ""
+    category_ids = [str(pk) for pk in user_obj.category_set.values_list("pk", flat=True)]
+    deep_page = max(1, expense_count // 20 // 2)
+
+    requests = {
+        "index": ("get", reverse("expenses:index"), {}),
+        "expense_list": ("get", reverse("expenses:expense_list"), {}),
+        "expense_list_deep": ("get", reverse("expenses:expense_list"), {"page": deep_page}),
+        "search_expenses": (
+            "get",
+            reverse("expenses:search"),
+            {"q": "a", "for": "expenses", "category_all": "1", "include": ["expenses", "bills"]},
+        ),
+        "search_billitems": ("get", reverse("expenses:search"), {"q": "e", "for": "billitems", "category_all": "1"}),
+        "search_purchases": ("get", reverse("expenses:search"), {"q": "e", "for": "purchases", "category": category_ids}),
+        "autocomplete_expense_vendor": ("get", reverse("expenses:api_autocomplete__expense_vendor"), {"q": "V"}),
+        "autocomplete_expense_description": (
+            "get",
+            reverse("expenses:api_autocomplete__expense_description"),
+            {"q": "P", "vendor": sample},
+        ),
+        "autocomplete_bill_vendor": ("get", reverse("expenses:api_autocomplete__bill_vendor"), {"q": "V"}),
+        "autocomplete_bill_item": ("get", reverse("expenses:api_autocomplete__bill_item"), {"q": "", "vendor": sample}),
+    }
+    for slug, report_class in AVAILABLE_REPORTS.items():
+        requests[f"report_{slug}"] = ("post", reverse("expenses:report_run", args=[slug]), _report_default_data(report_class))
+
+    setup_test_environment()
+    try:
+        client = Client()
+        client.force_login(user_obj)
+        timings = {name: _time_request(client, *request, repeat) for name, request in requests.items()}
+        timings.update(_benchmark_sync(user_obj, repeat))
+    finally:
+        teardown_test_environment()
+
+    return {
+        "user": user_obj.get_username(),
+        "expenses": expense_count,
+        "engine": connection.vendor,
+        "timings": timings,
+    }
+
+
+@benchmark("writes")
+def benchmark_writes(rows: int = 10, user: str = None, repeat: int = 5, **kwargs) -> dict:
+    """Time the write views, and compare the ways of committing the writes of a bill editor save.
+
+    ``rows`` is the number of bill items saved at once, to a new bill. Bill
+    items are saved with every statement committed on its own (autocommit),
+    with every save in its own transaction, and with all saves in one
+    transaction. The benchmark adds (and then deletes) bills, so do not run
+    it on a production database.
+    """
+    import json
+
+    from django.db import connection, models, transaction
+    from django.test import Client, RequestFactory
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from expenses.models import BillItem, Expense
+    from expenses.views.api_sync import RunEndpoint
+
+    user_obj = _find_user(user)
+    if user_obj is None:
+        return {"error": "No user with expenses found. Run expenses_generate_data first."}
+    category = user_obj.category_set.order_by("order").first()
+    before = timezone.now()
+
+    def new_bill() -> Expense:
+        bill = Expense(user=user_obj, category=category, vendor="Benchmark", is_bill=True)
+        bill.save()
+        return bill
+
+    def save_items(mode: str) -> None:
+        # A new bill every time, as saving an item recomputes the bill from all of its items.
+        bill = new_bill()
+        items = [
+            BillItem(user=user_obj, bill=bill, product=f"Item {n}", serving=1, count=1, unit_price=n)
+            for n in range(rows)
+        ]
+        if mode == "autocommit":
+            for item in items:
+                # Skip the transaction of ExpensesModel.save, as before it was added.
+                models.Model.save(item)
+        elif mode == "per_save":
+            for item in items:
+                item.save()
+        else:
+            with transaction.atomic():
+                for item in items:
+                    item.save()
+
+    timings = {}
+    for mode in ("autocommit", "per_save", "atomic"):
+        timings[f"bill_items_{mode}"] = _time_call(lambda: save_items(mode), repeat)
+
+    bill = new_bill()
+    # Bill editor fields: a{n}__{field} adds an item
+    items = {}
+    for n in range(rows):
+        items.update({f"a{n}__product": f"Item {n}", f"a{n}__count": "1", f"a{n}__unit_price": str(n)})
+    sync_request = RequestFactory().post(
+        "/",
+        json.dumps({"last_sync": timezone.now().isoformat(), "changes": {"expense": []}}),
+        content_type="application/json",
+    )
+    sync_request.user = user_obj
+    setup_test_environment()
+    try:
+        client = Client()
+        client.force_login(user_obj)
+        timings["bill_quickadd"] = _time_request(
+            client, "post", reverse("expenses:bill_quickadd"), {"quickadd": f"{category.pk};Benchmark"}, repeat
+        )
+        timings["bill_show_editor"] = _time_request(
+            client, "post", reverse("expenses:bill_show", args=[bill.pk]), items, repeat
+        )
+        timings["expense_convert"] = _time_request(
+            client, "post", reverse("expenses:expense_convert", args=[bill.pk]), {}, repeat
+        )
+        timings["sync_run"] = _time_call(lambda: RunEndpoint().post(sync_request), repeat)
+    finally:
+        teardown_test_environment()
+        for bill in Expense.objects.filter(user=user_obj, vendor="Benchmark", date_added__gte=before):
+            bill.delete()
+
+    return {
+        "user": user_obj.get_username(),
+        "engine": connection.vendor,
+        "rows": rows,
+        "timings": timings,
+        "speedup_per_save": timings["bill_items_autocommit"]["median_seconds"]
+        / timings["bill_items_per_save"]["median_seconds"],
+        "speedup_atomic": timings["bill_items_autocommit"]["median_seconds"]
+        / timings["bill_items_atomic"]["median_seconds"],
+    }
@@ -0,0 +1,139 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Cache helpers for Expenses.
+
+Every user has a data version, which changes whenever any of their data
+changes. Cache keys that include the version never need to be invalidated
+explicitly: a bump makes them unreachable, and they expire on their own.
+
+Versions are stored in the database (``DataVersion``), so that they are
+shared by all processes and survive cache evictions, and are cached, so
+that reading one usually costs a single cache lookup. They are bumped by
+the save and delete signals of all user data, and by ``bulk_create`` on
+``ExpensesQuerySet``. Code that uses ``update`` or ``bulk_update`` must call
+``bump_data_versions`` itself.
+
+Within ``batch_data_version_bumps``, bumps are collected and made once at
+the end, so that an operation that saves or deletes many objects (including
+cascades) bumps each user once.
+"""
+
+import contextlib
+import threading
+import time
+import typing
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+DATA_VERSION_KEY = "expenses_data_version:{}"
+DEFAULT_TIMEOUT = 86400
+
+# Users whose version was bumped in a transaction that is not committed yet.
+_uncommitted = threading.local()
+# Users whose version will be bumped at the end of the current batch.
+_batch = threading.local()
+
+
+def _new_version() -> int:
+    # Versions start at the current time in milliseconds, so that a user
+    # whose version row is recreated does not reuse old versions.
+    return int(time.time() * 1000)
+
+
+def _load_data_version(user_id: int) -> int:
+    from expenses.models import DataVersion
+
+    version = DataVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first()
+    if version is None:
+        version = _new_version()
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(user_id=user_id, version=version)
+        except IntegrityError:
+            # Created by another request in the meantime.
+            version = DataVersion.objects.values_list("version", flat=True).get(user_id=user_id)
+    return version
+
+
+def get_data_version(user_id: int) -> int:
+    """Get the current data version of a user."""
+    pending = getattr(_uncommitted, "user_ids", None)
+    if pending and not connection.in_atomic_block:
+        # The transaction was rolled back.
+        pending.clear()
+    elif pending and user_id in pending:
+        # Other requests must not see the new version before the data.
+        return _load_data_version(user_id)
+    key = DATA_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _load_data_version(user_id)
+        if cache.add(key, version, DEFAULT_TIMEOUT):
+            # A bump committed after the load may have cleared the key before it was added.
+            current = _load_data_version(user_id)
+            if current != version:
+                cache.delete(key)
+                version = current
+    return version
+
+
+def bump_data_versions(user_ids: typing.Iterable[int]) -> None:
+    """Mark all cached data of some users as stale."""
+    from expenses.models import DataVersion
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    batched = getattr(_batch, "user_ids", None)
+    if batched is not None:
+        batched.update(user_ids)
+        return
+    # Users without a version row get one (with a new version) when it is next read.
+    DataVersion.objects.filter(user_id__in=user_ids).update(version=F("version") + 1)
+    keys = [DATA_VERSION_KEY.format(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    if connection.in_atomic_block:
+        # Other requests can cache the old version until the transaction is committed.
+        pending = _uncommitted.__dict__.setdefault("user_ids", set())
+        pending.update(user_ids)
+
+        def on_commit():
+            pending.difference_update(user_ids)
+            cache.delete_many(keys)
+
+        transaction.on_commit(on_commit)
+
+
+@contextlib.contextmanager
+def batch_data_version_bumps():
+    """Collect the data version bumps made in a block, and make them once when it ends.
+
+    Use it inside the transaction that makes the changes. Nested batches are
+    part of the outermost one. Nothing is bumped if the block raises an
+    exception (as its transaction is rolled back).
+    """
+    if getattr(_batch, "user_ids", None) is not None:
+        yield
+        return
+    _batch.user_ids = set()
+    try:
+        yield
+        user_ids = _batch.user_ids
+    finally:
+        _batch.user_ids = None
+    bump_data_versions(user_ids)
+
+
+def bump_data_version(user_id: int) -> None:
+    """Mark all cached data of a user as stale."""
+    bump_data_versions([user_id])
+
+
+def versioned_key(prefix: str, user_id: int, *parts) -> str:
+    """Build a cache key that is valid until the user’s data changes."""
+    return ":".join(str(p) for p in (prefix, user_id, get_data_version(user_id), *parts))
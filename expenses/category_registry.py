@@ -0,0 +1,109 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Per-user category registry.
+
+Categories are needed by almost every page: forms, expense tables, reports
+and the dashboard. The registry holds a user’s ordered categories, with
+their URLs and links computed once. It is cached until one of the user’s
+categories is saved or deleted, and kept on the user object for the rest of
+the request.
+"""
+
+import time
+import typing
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.html import format_html
+from django.utils.safestring import SafeString
+
+from expenses.caching import DEFAULT_TIMEOUT
+
+CACHE_KEY = "expenses_category_registry:{}"
+REQUEST_ATTRIBUTE = "_expenses_category_registry"
+
+
+class CategoryRegistry:
+    """Ordered categories of a user, with their URLs and links."""
+
+    def __init__(self, categories: list):
+        self.categories = categories
+        # Changes whenever the registry is rebuilt, for keys of cached fragments that include links.
+        self.token = int(time.time() * 1000)
+        self.by_id = {c.pk: c for c in categories}
+        self.urls = {c.pk: c.get_absolute_url() for c in categories}
+        self.links = {c.pk: format_html('<a href="{0}">{1}</a>', self.urls[c.pk], c.name) for c in categories}
+
+    @classmethod
+    def load(cls, user_id: int) -> "CategoryRegistry":
+        from expenses.models import Category
+
+        return cls(list(Category.objects.filter(user_id=user_id).order_by("order")))
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def __contains__(self, pk):
+        return pk in self.by_id
+
+    def get(self, pk: int):
+        """Get a category by its ID, or None if the user has no such category."""
+        return self.by_id.get(pk)
+
+    def link(self, pk: int) -> SafeString:
+        """Get a HTML link to a category."""
+        return self.links.get(pk, "")
+
+    def choices(self) -> typing.List[typing.Tuple[int, str]]:
+        """Get (ID, name) choices for forms."""
+        return [(c.pk, c.name) for c in self.categories]
+
+
+def get_category_registry(user, refresh: bool = False) -> CategoryRegistry:
+    """Get the category registry of a user.
+
+    Set refresh to reload it from the database, eg. when a category is
+    missing from it.
+    """
+    registry = None if refresh else getattr(user, REQUEST_ATTRIBUTE, None)
+    if registry is None:
+        key = CACHE_KEY.format(user.pk)
+        registry = None if refresh else cache.get(key)
+        if registry is None:
+            registry = CategoryRegistry.load(user.pk)
+            cache.set(key, registry, getattr(settings, "EXPENSES_CACHE_TIMEOUT", DEFAULT_TIMEOUT))
+        setattr(user, REQUEST_ATTRIBUTE, registry)
+    return registry
+
+
+def get_category(user, pk: int):
+    """Get a category of a user by its ID, reloading the registry if it is not there."""
+    category = get_category_registry(user).get(pk)
+    if category is None:
+        category = get_category_registry(user, refresh=True).get(pk)
+    return category
+
+
+def get_category_link(user, pk: int) -> SafeString:
+    """Get a HTML link to a category of a user, reloading the registry if it is not there."""
+    if get_category(user, pk) is None:
+        return ""
+    return get_category_registry(user).link(pk)
+
+
+def invalidate_category_registry(user_id: int, user=None) -> None:
+    """Forget the cached category registry of a user."""
+    key = CACHE_KEY.format(user_id)
+    cache.delete(key)
+    if connection.in_atomic_block:
+        # Other requests can cache the old categories until the transaction is committed.
+        transaction.on_commit(lambda: cache.delete(key))
+    if user is not None and hasattr(user, REQUEST_ATTRIBUTE):
+        delattr(user, REQUEST_ATTRIBUTE)
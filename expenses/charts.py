@@ -0,0 +1,312 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Lightweight SVG charts.
+
+Charts are rendered from precomputed data with string templates. They use
+the same palette, labels and value formatting as the pygal charts they
+replace. pygal is optional: set ``EXPENSES_CHART_RENDERER`` to ``"pygal"``
+to use it instead.
+"""
+
+import decimal
+import math
+import typing
+
+from django.conf import settings
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from expenses.utils import format_money
+
+Number = typing.Union[int, float, decimal.Decimal]
+Formatter = typing.Callable[[Number], str]
+
+# pygal’s default palette
+COLORS = (
+    "#F44336",
+    "#3F51B5",
+    "#009688",
+    "#FFC107",
+    "#FF5722",
+    "#9C27B0",
+    "#03A9F4",
+    "#8BC34A",
+    "#FF9800",
+    "#E91E63",
+    "#2196F3",
+    "#4CAF50",
+    "#FFEB3B",
+    "#673AB7",
+    "#00BCD4",
+    "#CDDC39",
+    "#9E9E9E",
+    "#607D8B",
+)
+
+WIDTH = 800
+FONT_SIZE = 20
+SMALL_FONT_SIZE = 14
+LEGEND_COLUMNS = 3
+LEGEND_ROW_HEIGHT = 30
+# Slices smaller than this fraction of the pie are not labelled.
+MIN_LABELLED_SLICE = 0.03
+
+SVG_TEMPLATE = (
+    '<svg xmlns="http://www.w3.org/2000/svg" class="expenses-chart" viewBox="0 0 {width} {height}"'
+    ' style="font-family: var(--font-family-sans-serif); background: white">{body}</svg>'
+)
+SLICE_TEMPLATE = '<g><path d="{path}" fill="{color}" stroke="white"/><title>{label}: {value}</title></g>'
+CIRCLE_TEMPLATE = '<g><circle cx="{cx}" cy="{cy}" r="{r}" fill="{color}"/><title>{label}: {value}</title></g>'
+SLICE_LABEL_TEMPLATE = (
+    '<text x="{x:.2f}" y="{y:.2f}" text-anchor="middle" font-size="{size}" fill="white">'
+    '<tspan x="{x:.2f}" dy="-0.2em">{label}</tspan><tspan x="{x:.2f}" dy="1.2em">{value}</tspan></text>'
+)
+RECT_TEMPLATE = (
+    '<g><rect x="{x:.2f}" y="{y:.2f}" width="{width:.2f}" height="{height:.2f}" fill="{color}"/>'
+    "<title>{title}</title></g>"
+)
+LINE_TEMPLATE = '<line x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}" stroke="{color}"/>'
+TEXT_TEMPLATE = '<text x="{x:.2f}" y="{y:.2f}" text-anchor="{anchor}" font-size="{size}"{extra}>{text}</text>'
+LEGEND_TEMPLATE = (
+    '<rect x="{x:.2f}" y="{y:.2f}" width="{box}" height="{box}" fill="{color}"/>'
+    '<text x="{tx:.2f}" y="{ty:.2f}" font-size="{size}">{label}</text>'
+)
+
+
+def chart_renderer() -> str:
+    """Get the name of the configured chart renderer."""
+    return getattr(settings, "EXPENSES_CHART_RENDERER", "builtin")
+
+
+def _render_legend(labels: typing.List[str], top: float) -> typing.List[str]:
+    column_width = WIDTH / LEGEND_COLUMNS
+    box = FONT_SIZE * 0.7
+    parts = []
+    for n, label in enumerate(labels):
+        row, column = divmod(n, LEGEND_COLUMNS)
+        x = column * column_width + 10
+        y = top + row * LEGEND_ROW_HEIGHT
+        parts.append(
+            LEGEND_TEMPLATE.format(
+                x=x,
+                y=y,
+                box=box,
+                color=COLORS[n % len(COLORS)],
+                tx=x + box + 8,
+                ty=y + box,
+                size=FONT_SIZE,
+                label=escape(label),
+            )
+        )
+    return parts
+
+
+def _legend_height(count: int) -> int:
+    return math.ceil(count / LEGEND_COLUMNS) * LEGEND_ROW_HEIGHT
+
+
+def render_pie_chart(
+    data: typing.Iterable[typing.Tuple[str, Number]], formatter: Formatter = format_money
+) -> SafeString:
+    """Render a pie chart of (label, value) pairs as SVG."""
+    data = list(data)
+    if chart_renderer() == "pygal":
+        return _render_pygal_chart("Pie", [(label, [value]) for label, value in data], formatter)
+
+    radius = 240
+    cx = WIDTH / 2
+    cy = radius + 10
+    pie_height = 2 * radius + 20
+    slices = []
+    labels = []
+    total = sum(float(value) for _label, value in data if value > 0)
+    angle = 0.0
+    for n, (label, value) in enumerate(data):
+        if value <= 0 or not total:
+            continue
+        color = COLORS[n % len(COLORS)]
+        fraction = float(value) / total
+        formatted = escape(formatter(value))
+        if fraction >= 1:
+            slices.append(
+                CIRCLE_TEMPLATE.format(cx=cx, cy=cy, r=radius, color=color, label=escape(label), value=formatted)
+            )
+        else:
+            start = angle
+            end = angle + fraction * 2 * math.pi
+            # Angles are measured clockwise from the top of the pie.
+            x0, y0 = cx + radius * math.sin(start), cy - radius * math.cos(start)
+            x1, y1 = cx + radius * math.sin(end), cy - radius * math.cos(end)
+            path = "M {:.2f} {:.2f} L {:.2f} {:.2f} A {r} {r} 0 {large} 1 {:.2f} {:.2f} Z".format(
+                cx, cy, x0, y0, x1, y1, r=radius, large=int(fraction > 0.5)
+            )
+            slices.append(SLICE_TEMPLATE.format(path=path, color=color, label=escape(label), value=formatted))
+        if fraction >= MIN_LABELLED_SLICE:
+            middle = angle + fraction * math.pi
+            labels.append(
+                SLICE_LABEL_TEMPLATE.format(
+                    x=cx + radius * 0.6 * math.sin(middle),
+                    y=cy - radius * 0.6 * math.cos(middle),
+                    size=FONT_SIZE,
+                    label=escape(label),
+                    value=formatted,
+                )
+            )
+        angle += fraction * 2 * math.pi
+
+    legend = _render_legend([label for label, _value in data], pie_height)
+    height = pie_height + _legend_height(len(data))
+    return mark_safe(SVG_TEMPLATE.format(width=WIDTH, height=height, body="".join(slices + labels + legend)))
+
+
+def _nice_step(value_range: float, tick_count: int = 5) -> float:
+    """Find a round step (1, 2 or 5 times a power of 10) for about tick_count ticks."""
+    if value_range <= 0:
+        return 1
+    raw_step = value_range / tick_count
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    for multiplier in (1, 2, 5, 10):
+        if raw_step <= multiplier * magnitude:
+            return multiplier * magnitude
+    return 10 * magnitude
+
+
+def render_bar_chart(
+    labels: typing.List[str],
+    series: typing.List[typing.Tuple[str, typing.List[Number]]],
+    formatter: Formatter = format_money,
+    stacked: bool = False,
+) -> SafeString:
+    """Render a bar chart as SVG.
+
+    Every series is a (name, values) pair, with one value per label. Bars of
+    different series are drawn side by side, or on top of each other if
+    stacked is set.
+    """
+    if chart_renderer() == "pygal":
+        return _render_pygal_chart("StackedBar" if stacked else "Bar", series, formatter, labels)
+
+    plot_left, plot_top, plot_width, plot_height = 130, 20, WIDTH - 150, 400
+    label_area = 110
+    plot_bottom = plot_top + plot_height
+
+    # Positive values stack up from zero, negative values stack down.
+    if stacked:
+        highs = [sum(max(float(s[1][i]), 0) for s in series) for i in range(len(labels))]
+        lows = [sum(min(float(s[1][i]), 0) for s in series) for i in range(len(labels))]
+    else:
+        highs = [max([float(s[1][i]) for s in series] + [0]) for i in range(len(labels))]
+        lows = [min([float(s[1][i]) for s in series] + [0]) for i in range(len(labels))]
+    high = max(highs, default=0)
+    low = min(lows, default=0)
+    step = _nice_step(high - low)
+    high = math.ceil(high / step) * step
+    low = math.floor(low / step) * step
+    if high == low:
+        high = low + step
+
+    def y_of(value: float) -> float:
+        return plot_bottom - (value - low) / (high - low) * plot_height
+
+    parts = []
+    for n in range(round((high - low) / step) + 1):
+        tick = low + n * step
+        y = y_of(tick)
+        parts.append(LINE_TEMPLATE.format(x1=plot_left, y1=y, x2=plot_left + plot_width, y2=y, color="#e0e0e0"))
+        parts.append(
+            TEXT_TEMPLATE.format(
+                x=plot_left - 8, y=y + 5, anchor="end", size=SMALL_FONT_SIZE, extra="", text=escape(formatter(tick))
+            )
+        )
+
+    slot = plot_width / max(len(labels), 1)
+    bar_width = slot * 0.8 if stacked else slot * 0.8 / max(len(series), 1)
+    # Show at most about 30 labels, rotated to fit.
+    label_every = max(1, math.ceil(len(labels) / 30))
+    for i, label in enumerate(labels):
+        slot_left = plot_left + i * slot + slot * 0.1
+        positive_base = negative_base = 0.0
+        for n, (name, values) in enumerate(series):
+            value = float(values[i])
+            if stacked:
+                x = slot_left
+                if value >= 0:
+                    top, bottom = positive_base + value, positive_base
+                    positive_base = top
+                else:
+                    top, bottom = negative_base, negative_base + value
+                    negative_base = bottom
+            else:
+                x = slot_left + n * bar_width
+                top, bottom = max(value, 0), min(value, 0)
+            if top == bottom:
+                continue
+            parts.append(
+                RECT_TEMPLATE.format(
+                    x=x,
+                    y=y_of(top),
+                    width=bar_width,
+                    height=y_of(bottom) - y_of(top),
+                    color=COLORS[n % len(COLORS)],
+                    title=escape(f"{label} — {name}: {formatter(values[i])}"),
+                )
+            )
+        if i % label_every == 0:
+            x = plot_left + (i + 0.5) * slot
+            y = plot_bottom + 16
+            parts.append(
+                TEXT_TEMPLATE.format(
+                    x=x,
+                    y=y,
+                    anchor="end",
+                    size=SMALL_FONT_SIZE,
+                    extra=f' transform="rotate(-45 {x:.2f} {y:.2f})"',
+                    text=escape(label),
+                )
+            )
+    parts.append(
+        LINE_TEMPLATE.format(x1=plot_left, y1=y_of(0), x2=plot_left + plot_width, y2=y_of(0), color="#000000")
+    )
+
+    legend_top = plot_bottom + label_area
+    parts += _render_legend([name for name, _values in series], legend_top)
+    height = legend_top + _legend_height(len(series))
+    return mark_safe(SVG_TEMPLATE.format(width=WIDTH, height=height, body="".join(parts)))
+
+
+def _render_pygal_chart(
+    chart_type: str,
+    series: typing.List[typing.Tuple[str, typing.List[Number]]],
+    formatter: Formatter,
+    labels: typing.Optional[typing.List[str]] = None,
+) -> SafeString:
+    """Render a chart with pygal, imported on first use."""
+    import pygal
+    import pygal.style
+
+    chart = getattr(pygal, chart_type)(
+        disable_xml_declaration=True,
+        margin=0,
+        legend_at_bottom=True,
+        print_values=chart_type == "Pie",
+        print_labels=chart_type == "Pie",
+        x_label_rotation=-45,
+        style=pygal.style.DefaultStyle(
+            plot_background="white",
+            background="white",
+            font_family="var(--font-family-sans-serif)",
+            label_font_size=20,
+            value_font_size=20,
+            value_label_font_size=20,
+            tooltip_font_size=20,
+            legend_font_size=20,
+        ),
+    )
+    if labels is not None:
+        chart.x_labels = labels
+    for name, values in series:
+        chart.add(name, [float(v) for v in values], formatter=formatter)
+    return mark_safe(chart.render())
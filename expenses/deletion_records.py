@@ -0,0 +1,85 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Deletion record compaction.
+
+Every deleted object leaves a deletion record, so that sync clients can
+remove it too. If ``EXPENSES_DELETION_RECORD_HORIZON`` is set, ``python
+manage.py expenses_compact_deletion_records`` removes records older than that
+many days, in chunks, and should be run periodically (eg. weekly from cron).
+
+Before removing anything, the compaction saves its cutoff date
+(``DeletionRecordCutoff``). Clients that last synced before the cutoff may
+have missed deletions, so they are told to do a full sync instead of a delta
+sync. Until the first compaction, no client needs a full sync.
+"""
+
+import datetime
+import typing
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULT_HORIZON = None
+CHUNK_SIZE = 5000
+
+
+def get_horizon_days() -> typing.Optional[int]:
+    """Get the number of days deletion records are kept for, or None if they are kept forever."""
+    return getattr(settings, "EXPENSES_DELETION_RECORD_HORIZON", DEFAULT_HORIZON)
+
+
+def get_horizon(now: typing.Optional[datetime.datetime] = None) -> typing.Optional[datetime.datetime]:
+    """Get the date before which deletion records may have been removed, or None if they are kept forever."""
+    days = get_horizon_days()
+    if days is None:
+        return None
+    if now is None:
+        now = timezone.now()
+    return now - datetime.timedelta(days=days)
+
+
+def get_cutoff() -> typing.Optional[datetime.datetime]:
+    """Get the date before which deletion records may have been removed, or None if none were."""
+    from expenses.models import DeletionRecordCutoff
+
+    return DeletionRecordCutoff.objects.values_list("date", flat=True).first()
+
+
+def _save_cutoff(horizon: datetime.datetime) -> None:
+    from expenses.models import DeletionRecordCutoff
+
+    with transaction.atomic():
+        cutoff = DeletionRecordCutoff.objects.select_for_update().first()
+        if cutoff is None:
+            DeletionRecordCutoff.objects.create(date=horizon)
+        elif cutoff.date < horizon:
+            cutoff.date = horizon
+            cutoff.save()
+
+
+def compact_deletion_records(
+    horizon: datetime.datetime,
+    chunk_size: int = CHUNK_SIZE,
+    progress: typing.Optional[typing.Callable[[int], None]] = None,
+) -> int:
+    """Remove deletion records older than a date, in chunks. Returns the number of removed records."""
+    from expenses.models import DeletionRecord
+
+    # Saved (and committed) first, so that syncs during the compaction already know about it.
+    _save_cutoff(horizon)
+    # Records are added in date order, so the old ones come first by ID.
+    old_records = DeletionRecord.objects.filter(date__lt=horizon).order_by("pk")
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(old_records.values_list("pk", flat=True)[:chunk_size])
+            if not pks:
+                break
+            deleted += DeletionRecord.objects.filter(pk__in=pks).delete()[0]
+        if progress is not None:
+            progress(deleted)
+    return deleted
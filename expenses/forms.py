@@ -3,20 +3,50 @@
 # All rights reserved.
 # See /LICENSE for licensing information.
 
+import codecs
+
 from django import forms
+from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy
 
+from expenses.category_registry import get_category, get_category_registry
+from expenses.schedules import SCHEDULED_TYPES
+from expenses.template_plans import compile_run_plan
 from expenses.utils import today_date
-from expenses.models import Expense, Category, BillItem, ExpenseTemplate
+from expenses.models import Expense, Category, BillItem, ExpenseTemplate, ImportMapping
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """A category field that takes its choices from the user’s category registry."""
+
+    user = None
+
+    def set_user(self, user):
+        self.queryset = Category.objects.filter(user=user).order_by("order")
+        if user is not None:
+            self.user = user
+            empty_choice = [] if self.empty_label is None else [("", self.empty_label)]
+            self.choices = empty_choice + get_category_registry(user).choices()
+
+    def to_python(self, value):
+        if self.user is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            category = get_category(self.user, int(value))
+        except (TypeError, ValueError):
+            category = None
+        if category is None:
+            raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value})
+        return category
 
 
 class ExpenseForm(forms.ModelForm):
-    category = forms.ModelChoiceField(queryset=None, widget=forms.Select(attrs={"class": "form-select"}))
+    category = CategoryChoiceField(queryset=None, widget=forms.Select(attrs={"class": "form-select"}))
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
-        self.fields["category"].queryset = Category.objects.filter(user=user).order_by("order")
+        self.fields["category"].set_user(user)
         self.fields["date"].default = today_date().strftime("%Y-%m-%d")
         self.fields["description"].required = True
 
@@ -38,12 +68,12 @@ class ExpenseForm(forms.ModelForm):
 
 
 class BillForm(forms.ModelForm):
-    category = forms.ModelChoiceField(queryset=None, widget=forms.Select(attrs={"class": "form-select"}))
+    category = CategoryChoiceField(queryset=None, widget=forms.Select(attrs={"class": "form-select"}))
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
-        self.fields["category"].queryset = Category.objects.filter(user=user).order_by("order")
+        self.fields["category"].set_user(user)
         self.fields["date"].default = today_date().strftime("%Y-%m-%d")
         self.fields["description"].required = False
 
@@ -97,19 +127,19 @@ class CategoryForm(forms.ModelForm):
 
 
 class TemplateForm(forms.ModelForm):
-    category = forms.ModelChoiceField(queryset=None, widget=forms.Select(attrs={"class": "form-select"}))
+    category = CategoryChoiceField(queryset=None, widget=forms.Select(attrs={"class": "form-select"}))
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
-        self.fields["category"].queryset = Category.objects.filter(user=user).order_by("order")
+        self.fields["category"].set_user(user)
         self.fields["description"].required = True
         self.fields["comment"].required = False
         self.fields["amount"].required = False
 
     class Meta:
         model = ExpenseTemplate
-        fields = ["name", "vendor", "category", "amount", "description", "type", "comment"]
+        fields = ["name", "vendor", "category", "amount", "description", "type", "comment", "schedule", "schedule_day"]
         widgets = {
             "name": forms.TextInput(attrs={"class": "form-control", "placeholder": gettext_lazy("Name")}),
             "vendor": forms.TextInput(
@@ -126,6 +156,8 @@ class TemplateForm(forms.ModelForm):
                 }
             ),
             "type": forms.RadioSelect(),
+            "schedule": forms.Select(attrs={"class": "form-select"}),
+            "schedule_day": forms.NumberInput(attrs={"class": "form-control", "min": "1", "max": "31"}),
             "comment": forms.Textarea(
                 attrs={
                     "class": "form-control expenses-tmplform-comment",
@@ -142,3 +174,63 @@ class TemplateForm(forms.ModelForm):
 
         if not amount and template_type != "menu":
             self.add_error("amount", gettext_lazy("Amount is required for this template type."))
+
+        description = cleaned_data.get("description")
+        if template_type and description:
+            for line in compile_run_plan(template_type, description).invalid_lines:
+                self.add_error("description", gettext_lazy("Line %d does not start with a valid amount.") % line)
+
+        schedule = cleaned_data.get("schedule")
+        schedule_day = cleaned_data.get("schedule_day")
+        if schedule and template_type not in SCHEDULED_TYPES:
+            self.add_error("schedule", gettext_lazy("Only simple and count templates can be scheduled."))
+        elif schedule == "monthly" and not (schedule_day and 1 <= schedule_day <= 31):
+            self.add_error("schedule_day", gettext_lazy("Enter a day of the month (1–31)."))
+        elif schedule == "weekly" and not (schedule_day and 1 <= schedule_day <= 7):
+            self.add_error("schedule_day", gettext_lazy("Enter a day of the week (1–7, Monday is 1)."))
+
+
+class ImportForm(forms.ModelForm):
+    file = forms.FileField(label=gettext_lazy("CSV file"))
+    default_category = CategoryChoiceField(
+        queryset=None, required=False, widget=forms.Select(attrs={"class": "form-select"})
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop("user", None)
+        super().__init__(*args, **kwargs)
+        self.fields["default_category"].set_user(user)
+
+    class Meta:
+        model = ImportMapping
+        fields = [
+            "file",
+            "encoding",
+            "delimiter",
+            "date_column",
+            "date_format",
+            "vendor_column",
+            "amount_column",
+            "description_column",
+            "category_column",
+            "default_category",
+            "negate_amounts",
+        ]
+        widgets = {
+            "encoding": forms.TextInput(attrs={"class": "form-control"}),
+            "delimiter": forms.Select(attrs={"class": "form-select"}),
+            "date_column": forms.TextInput(attrs={"class": "form-control"}),
+            "date_format": forms.TextInput(attrs={"class": "form-control"}),
+            "vendor_column": forms.TextInput(attrs={"class": "form-control"}),
+            "amount_column": forms.TextInput(attrs={"class": "form-control"}),
+            "description_column": forms.TextInput(attrs={"class": "form-control"}),
+            "category_column": forms.TextInput(attrs={"class": "form-control"}),
+        }
+
+    def clean_encoding(self):
+        encoding = self.cleaned_data["encoding"]
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise ValidationError(gettext_lazy("Unknown encoding."))
+        return encoding
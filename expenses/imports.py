@@ -0,0 +1,237 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""CSV import.
+
+Expenses are imported from CSV files (bank statements, or files exported
+from Expenses), with columns found by the header names saved in the user’s
+``ImportMapping``. Files are read as a stream and inserted in chunks, so
+memory use does not depend on the size of the file.
+
+Rows that match an existing expense on date, vendor and amount are skipped as
+duplicates. Each chunk is checked against an index of existing expenses in
+its date range, built with one grouped query, so importing the same file
+twice adds nothing. Identical rows in one file are all imported (they can be
+two real expenses), as long as there are more of them than existing matches.
+"""
+
+import codecs
+import collections
+import csv
+import datetime
+import decimal
+import functools
+import io
+import typing
+
+import attr
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from expenses.caching import batch_data_version_bumps
+from expenses.category_registry import get_category_registry
+from expenses.utils import parse_amount_input
+
+CHUNK_SIZE = 1000
+MAX_ERRORS = 100
+
+ExpenseKey = typing.Tuple[datetime.date, str, decimal.Decimal]
+
+
+class ImportFileError(ValueError):
+    """Raised when a file cannot be imported at all."""
+
+
+@attr.s(auto_attribs=True)
+class ImportResult:
+    rows: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    # Rows with amounts that are not expenses (zero, or income)
+    skipped: int = 0
+    error_count: int = 0
+    # (line number, message) of the first MAX_ERRORS errors
+    errors: typing.List[typing.Tuple[int, str]] = attr.Factory(list)
+
+    def add_error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+class _RowError(ValueError):
+    pass
+
+
+def _truncate(text: str, length: int) -> str:
+    # Much faster than Truncator, which matters for large files.
+    return text if len(text) <= length else text[: length - 1] + "…"
+
+
+def _find_columns(header: typing.List[str], mapping) -> typing.Dict[str, typing.Optional[int]]:
+    """Find the indexes of mapped columns in the header row."""
+    positions = {name.strip().casefold(): n for n, name in enumerate(header)}
+    columns = {}
+    for field in ("date", "vendor", "amount", "description", "category"):
+        name = getattr(mapping, field + "_column").strip()
+        columns[field] = positions.get(name.casefold()) if name else None
+        if columns[field] is None and field in {"date", "vendor", "amount"}:
+            raise ImportFileError(_("Column “%s” not found in the file.") % name)
+    return columns
+
+
+def _parse_row(
+    row: typing.List[str],
+    columns: dict,
+    mapping,
+    categories: typing.Dict[str, int],
+    parse_date: typing.Callable[[str], datetime.date],
+):
+    """Parse a row into expense fields, or return None if it is not an expense."""
+
+    def value(field):
+        index = columns[field]
+        if index is None or index >= len(row):
+            return ""
+        return row[index].strip()
+
+    try:
+        date = parse_date(value("date"))
+    except ValueError:
+        raise _RowError(_("Invalid date: %s") % value("date"))
+
+    amount = parse_amount_input(value("amount").replace(" ", "").replace("\xa0", ""))
+    if amount is None or not amount.is_finite():
+        raise _RowError(_("Invalid amount: %s") % value("amount"))
+    if mapping.negate_amounts:
+        amount = -amount
+    if amount <= 0:
+        return None
+
+    category_name = value("category")
+    category_id = categories.get(category_name.casefold()) if category_name else None
+    if category_id is None:
+        category_id = mapping.default_category_id
+    if category_id is None:
+        raise _RowError(_("Unknown category: %s") % category_name)
+
+    vendor = _truncate(value("vendor"), 40)
+    if not vendor:
+        raise _RowError(_("Missing vendor"))
+    return {
+        "date": date,
+        "vendor": vendor,
+        "amount": amount.quantize(decimal.Decimal("0.01")),
+        "description": _truncate(value("description"), 80),
+        "category_id": category_id,
+    }
+
+
+def _insert_chunk(
+    user,
+    chunk: typing.List[dict],
+    started: datetime.datetime,
+    existing: typing.Counter[ExpenseKey],
+    loaded_dates: typing.Set[datetime.date],
+    result: ImportResult,
+) -> None:
+    """Insert a chunk of parsed rows, skipping duplicates of expenses that existed before the import.
+
+    existing counts the expenses (from before the import) not yet matched by a
+    row, on the dates in loaded_dates. Both are shared by all chunks of an
+    import, and updated with the dates of this chunk.
+    """
+    from expenses.models import Expense
+
+    new_dates = {row["date"] for row in chunk} - loaded_dates
+    if new_dates:
+        matches = (
+            Expense.objects.filter(user=user, date__in=new_dates, date_added__lt=started)
+            .order_by()
+            .values_list("date", "vendor", "amount")
+            .annotate(count=models.Count("id"))
+        )
+        for date, vendor, amount, count in matches:
+            existing[date, vendor, amount] = count
+        loaded_dates.update(new_dates)
+
+    expenses = []
+    for row in chunk:
+        key = (row["date"], row["vendor"], row["amount"])
+        if existing[key] > 0:
+            existing[key] -= 1
+            result.duplicates += 1
+            continue
+        # bulk_create does not send pre_save
+        expenses.append(Expense(user=user, description_cache=row["description"], **row))
+    Expense.objects.bulk_create(expenses)
+    result.imported += len(expenses)
+
+
+def import_expenses(
+    user,
+    file: typing.BinaryIO,
+    mapping,
+    progress: typing.Optional[typing.Callable[[ImportResult], None]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> ImportResult:
+    """Import expenses from a CSV file, in one transaction.
+
+    progress is called with the partial result after every chunk. Raises
+    ImportFileError if the file cannot be read.
+    """
+    encoding = codecs.lookup(mapping.encoding).name
+    if encoding == "utf-8":
+        # Skip the byte order mark (added to CSV files exported from Expenses)
+        encoding = "utf-8-sig"
+    reader = csv.reader(io.TextIOWrapper(file, encoding=encoding, newline=""), delimiter=mapping.delimiter)
+    categories = {c.name.casefold(): c.pk for c in get_category_registry(user)}
+
+    # Statements have many rows per day, so most dates are parsed once.
+    @functools.lru_cache(maxsize=1024)
+    def parse_date(text: str) -> datetime.date:
+        return datetime.datetime.strptime(text, mapping.date_format).date()
+
+    result = ImportResult()
+    started = timezone.now()
+    # Expenses that existed before the import, which rows are matched against.
+    existing: typing.Counter[ExpenseKey] = collections.Counter()
+    loaded_dates: typing.Set[datetime.date] = set()
+    line = 1
+    try:
+        header = next(reader, None)
+        if header is None:
+            raise ImportFileError(_("The file is empty."))
+        columns = _find_columns(header, mapping)
+
+        with transaction.atomic(), batch_data_version_bumps():
+            chunk = []
+            for line, row in enumerate(reader, 2):
+                if not any(row):
+                    continue
+                result.rows += 1
+                try:
+                    parsed = _parse_row(row, columns, mapping, categories, parse_date)
+                except _RowError as exc:
+                    result.add_error(line, str(exc))
+                    continue
+                if parsed is None:
+                    result.skipped += 1
+                    continue
+                chunk.append(parsed)
+                if len(chunk) >= chunk_size:
+                    _insert_chunk(user, chunk, started, existing, loaded_dates, result)
+                    chunk = []
+                    if progress is not None:
+                        progress(result)
+            if chunk:
+                _insert_chunk(user, chunk, started, existing, loaded_dates, result)
+                if progress is not None:
+                    progress(result)
+    except (csv.Error, UnicodeDecodeError) as exc:
+        message = _("The file cannot be read (near line %(line)d): %(error)s") % {"line": line, "error": exc}
+        raise ImportFileError(message)
+    return result
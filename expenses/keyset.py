@@ -0,0 +1,226 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Keyset (seek) pagination.
+
+Pages are found by filtering on the ordering key of the last (or first) row
+of the previous page, instead of with ``OFFSET``, so that any page reached
+with the previous/next links costs as much as the first one. Jumping to an
+arbitrary page still uses ``OFFSET``, except for the last page, which is
+read backwards.
+
+Totals are counted at most once per user data version, and only up to
+``EXPENSES_COUNT_LIMIT`` rows. Longer lists get an approximate total.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+import math
+import typing
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+from expenses.caching import DEFAULT_TIMEOUT, versioned_key
+
+EXPENSE_ORDERING = ("-date", "-date_added", "-id")
+
+
+def encode_cursor(forward: bool, values: typing.List[typing.Any]) -> str:
+    """Encode a position in a list as an opaque string."""
+    values = [v.isoformat() if isinstance(v, (datetime.date, datetime.datetime)) else v for v in values]
+    data = json.dumps([1 if forward else 0] + values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> typing.Optional[typing.Tuple[bool, typing.List[typing.Any]]]:
+    """Decode a cursor into (forward, values), or return None if it is invalid."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(data, list) or len(data) < 2:
+        return None
+    return bool(data[0]), data[1:]
+
+
+class KeysetPage:
+    """A page of results, compatible with the parts of Django’s Page used by templates."""
+
+    def __init__(
+        self,
+        object_list: list,
+        number: int,
+        paginator: "KeysetPaginator",
+        has_previous: bool,
+        has_next: bool,
+    ):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f"<Page {self.number}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+    def previous_page_number(self) -> int:
+        return self.number - 1
+
+    @property
+    def next_cursor(self) -> typing.Optional[str]:
+        if not self._has_next or not self.object_list:
+            return None
+        return encode_cursor(True, self.paginator.key_values(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self) -> typing.Optional[str]:
+        if not self._has_previous or not self.object_list:
+            return None
+        return encode_cursor(False, self.paginator.key_values(self.object_list[0]))
+
+
+class KeysetPaginator:
+    """Paginate a queryset by a unique ordering key.
+
+    The last field of ordering must be unique (eg. ``id``). Totals are cached
+    under count_name for the user, until the user’s data changes.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        ordering: typing.Sequence[str],
+        per_page: int,
+        user_id: int,
+        count_name: str,
+    ):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.user_id = user_id
+        self.count_name = count_name
+        self._count = None
+        self.approximate = False
+
+    @property
+    def count(self) -> int:
+        """Number of rows, or the count limit if there are more (see approximate)."""
+        if self._count is None:
+            limit = getattr(settings, "EXPENSES_COUNT_LIMIT", 10000)
+            key = versioned_key("expenses_count", self.user_id, self.count_name, limit)
+            count = cache.get(key)
+            if count is None:
+                count = self.queryset.order_by()[: limit + 1].count()
+                cache.set(key, count, getattr(settings, "EXPENSES_CACHE_TIMEOUT", DEFAULT_TIMEOUT))
+            self.approximate = count > limit
+            self._count = min(count, limit)
+        return self._count
+
+    @property
+    def num_pages(self) -> int:
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def key_values(self, obj) -> list:
+        return [getattr(obj, field.lstrip("-")) for field in self.ordering]
+
+    def _parse_key_values(self, values: list) -> typing.Optional[list]:
+        """Convert key values decoded from a cursor to field values, or return None if they are invalid."""
+        if len(values) != len(self.ordering):
+            return None
+        parsed = []
+        for field_name, value in zip(self.ordering, values):
+            field = self.queryset.model._meta.get_field(field_name.lstrip("-"))
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                return None
+            if value is None:
+                return None
+            parsed.append(value)
+        return parsed
+
+    def _seek_filter(self, values: list, forward: bool) -> Q:
+        """Build a filter for rows after (or before) the row with the given key values."""
+        condition = Q()
+        for n, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") == forward else "gt"
+            term = Q(**{f"{name}__{lookup}": values[n]})
+            for previous_field, previous_value in zip(self.ordering[:n], values[:n]):
+                term &= Q(**{previous_field.lstrip("-"): previous_value})
+            condition |= term
+        return condition
+
+    def _reversed_ordering(self) -> typing.List[str]:
+        return [field[1:] if field.startswith("-") else "-" + field for field in self.ordering]
+
+    def seek(self, values: list, forward: bool = True) -> QuerySet:
+        """Get the rows after (or, if not forward, before) the row with the given key values.
+
+        Rows before are ordered backwards, starting with the nearest one.
+        """
+        ordering = self.ordering if forward else self._reversed_ordering()
+        return self.queryset.filter(self._seek_filter(values, forward)).order_by(*ordering)
+
+    def get_page(self, number, cursor: typing.Optional[str] = None) -> KeysetPage:
+        """Get a page by its number, using the cursor to find it if one is given."""
+        try:
+            number = max(1, int(number))
+        except (TypeError, ValueError):
+            number = 1
+        num_pages = self.num_pages
+        if not self.approximate:
+            number = min(number, num_pages)
+        per_page = self.per_page
+
+        decoded = decode_cursor(cursor) if cursor else None
+        values = self._parse_key_values(decoded[1]) if decoded is not None else None
+        if values is not None:
+            forward = decoded[0]
+            rows = list(self.seek(values, forward)[: per_page + 1])
+            if forward:
+                return KeysetPage(rows[:per_page], number, self, True, len(rows) > per_page)
+            has_previous = len(rows) > per_page
+            rows = rows[:per_page]
+            rows.reverse()
+            return KeysetPage(rows, number if has_previous else 1, self, has_previous, True)
+
+        if number == 1:
+            rows = list(self.queryset.order_by(*self.ordering)[: per_page + 1])
+            return KeysetPage(rows[:per_page], 1, self, False, len(rows) > per_page)
+
+        if number == num_pages and not self.approximate:
+            # The last page is the beginning of the reversed list.
+            remainder = self.count - (number - 1) * per_page
+            rows = list(self.queryset.order_by(*self._reversed_ordering())[:remainder])
+            rows.reverse()
+            return KeysetPage(rows, number, self, True, False)
+
+        offset = (number - 1) * per_page
+        rows = list(self.queryset.order_by(*self.ordering)[offset : offset + per_page + 1])
+        return KeysetPage(rows[:per_page], number, self, True, len(rows) > per_page)
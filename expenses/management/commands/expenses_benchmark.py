@@ -0,0 +1,49 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+import json
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from expenses.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Run Expenses performance benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark to run.")
+        parser.add_argument("--rows", type=int, default=None, help="Number of rows to benchmark with.")
+        parser.add_argument("--user", default=None, help="User whose data should be used.")
+        parser.add_argument("--repeat", type=int, default=None, help="Number of times to repeat each measurement.")
+        parser.add_argument("--output", default=None, help="Save results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        kwargs = {k: options[k] for k in ("rows", "user", "repeat") if options[k] is not None}
+        results = BENCHMARKS[options["benchmark"]](**kwargs)
+        if "error" in results:
+            raise CommandError(results["error"])
+
+        for key, value in results.items():
+            if isinstance(value, float):
+                value = f"{value:.6f}"
+            elif isinstance(value, dict):
+                value = "".join(f"\n  {k}: {json.dumps(v)}" for k, v in value.items())
+            self.stdout.write(f"{key}: {value}")
+
+        if options["output"]:
+            output = {
+                "benchmark": options["benchmark"],
+                "date": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "arguments": kwargs,
+                "results": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(output, fh, indent=2)
@@ -0,0 +1,32 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.benchmarks import URLS_IMPORT_BUDGET_MS, measure_import_time
+
+
+class Command(BaseCommand):
+    help = "Check that importing expenses.urls (or another module) stays within an import-time budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default="expenses.urls", help="Module to import.")
+        parser.add_argument(
+            "--budget", type=float, default=URLS_IMPORT_BUDGET_MS, help="Import-time budget in milliseconds."
+        )
+        parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to show.")
+
+    def handle(self, *args, **options):
+        results = measure_import_time(options["module"], options["top"])
+        if "error" in results:
+            raise CommandError(results["error"])
+
+        for name, seconds in results["slowest"].items():
+            self.stdout.write(f"{seconds * 1000:8.2f} ms  {name}")
+        total_ms = results["seconds"] * 1000
+        message = f"{options['module']}: {total_ms:.2f} ms (budget: {options['budget']:.2f} ms)"
+        if total_ms > options["budget"]:
+            raise CommandError(message)
+        self.stdout.write(message)
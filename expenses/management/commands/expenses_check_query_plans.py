@@ -0,0 +1,42 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.query_plans import check_query_plans
+
+
+class Command(BaseCommand):
+    help = "Check that the hot queries use their indexes, with EXPLAIN."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to run the queries for (default: first user with expenses).")
+        parser.add_argument("--show-plans", action="store_true", help="Show the query plans.")
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        if options["user"] is None:
+            user = user_model.objects.filter(expense__isnull=False).distinct().first()
+        else:
+            user = user_model.objects.filter(**{user_model.USERNAME_FIELD: options["user"]}).first()
+        if user is None:
+            raise CommandError("User not found.")
+
+        try:
+            results = check_query_plans(user.pk)
+        except NotImplementedError as exc:
+            raise CommandError(str(exc))
+
+        failed = []
+        for name, (used, index, plan) in results.items():
+            self.stdout.write(f"{'OK  ' if used else 'FAIL'} {name} ({index})")
+            if options["show_plans"] or not used:
+                for line in plan.splitlines():
+                    self.stdout.write(f"       {line}")
+            if not used:
+                failed.append(name)
+        if failed:
+            raise CommandError(f"Queries not using their indexes: {', '.join(failed)}")
@@ -0,0 +1,23 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.deletion_records import compact_deletion_records, get_horizon
+
+
+class Command(BaseCommand):
+    help = "Remove deletion records older than EXPENSES_DELETION_RECORD_HORIZON days."
+
+    def handle(self, *args, **options):
+        horizon = get_horizon()
+        if horizon is None:
+            raise CommandError("EXPENSES_DELETION_RECORD_HORIZON is not set, deletion records are kept forever.")
+
+        def progress(deleted):
+            self.stdout.write(f"{deleted} removed")
+
+        deleted = compact_deletion_records(horizon, progress=progress)
+        self.stdout.write(f"Removed {deleted} deletion records older than {horizon:%Y-%m-%d %H:%M}.")
@@ -0,0 +1,28 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.backup import export_archive
+
+
+class Command(BaseCommand):
+    help = "Export all data of a user as a zip archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Archive to write.")
+        parser.add_argument("--user", required=True, help="Username to export the data of.")
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        user = user_model.objects.filter(**{user_model.USERNAME_FIELD: options["user"]}).first()
+        if user is None:
+            raise CommandError("User not found.")
+
+        with open(options["file"], "wb") as fh:
+            for data in export_archive(user):
+                fh.write(data)
+        self.stdout.write(f"Exported to {options['file']}.")
@@ -0,0 +1,171 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+import datetime
+import decimal
+import itertools
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify, Truncator
+
+from expenses.models import BillItem, Category, DeletionRecord, Expense, ExpenseTemplate
+from expenses.utils import round_money, today_date
+
+CATEGORY_NAMES = [
+    "Groceries",
+    "Restaurants",
+    "Transport",
+    "Rent",
+    "Utilities",
+    "Entertainment",
+    "Health",
+    "Clothing",
+    "Gifts",
+    "Travel",
+    "Household",
+    "Other",
+]
+PRODUCTS = ["Bread", "Milk", "Butter", "Cheese", "Apples", "Coffee", "Tea", "Eggs", "Rice", "Pasta", "Water", "Juice"]
+BATCH_SIZE = 1000
+
+
+class ZipfChoice:
+    """Pick items with a power-law (Zipf) distribution: a few are very popular, most are rare."""
+
+    def __init__(self, rng: random.Random, items: list, exponent: float = 1.1):
+        self.rng = rng
+        self.items = items
+        self.cum_weights = list(itertools.accumulate(1 / (rank**exponent) for rank in range(1, len(items) + 1)))
+
+    def __call__(self):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+
+class Command(BaseCommand):
+    help = "Generate realistic synthetic data for testing and benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1, help="Number of users to generate.")
+        parser.add_argument("--prefix", default="bench", help="Username prefix.")
+        parser.add_argument("--years", type=int, default=3, help="Years of history per user.")
+        parser.add_argument("--per-day", type=float, default=3, help="Average number of expenses per day.")
+        parser.add_argument("--bills", type=float, default=0.1, help="Fraction of expenses that are bills.")
+        parser.add_argument("--vendors", type=int, default=300, help="Number of distinct vendors.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        user_model = get_user_model()
+        for n in range(1, options["users"] + 1):
+            username = f"{options['prefix']}{n}"
+            user, created = user_model.objects.get_or_create(**{user_model.USERNAME_FIELD: username})
+            if not created:
+                self.stderr.write(f"{username}: user already exists, skipping")
+                continue
+            with transaction.atomic():
+                counts = self.generate_user_data(user, rng, options)
+            self.stdout.write(f"{username}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+
+    def generate_user_data(self, user, rng: random.Random, options: dict) -> dict:
+        categories = []
+        for order, name in enumerate(CATEGORY_NAMES, 1):
+            slug = slugify(name)
+            categories.append(Category(user=user, name=name, slug=slug, slugbase=slug, order=order))
+        categories = Category.objects.bulk_create(categories)
+
+        pick_vendor = ZipfChoice(rng, [f"Vendor {i}" for i in range(1, options["vendors"] + 1)])
+        pick_category = ZipfChoice(rng, categories, 0.8)
+        pick_product = ZipfChoice(rng, PRODUCTS)
+
+        today = today_date()
+        first_day = today - datetime.timedelta(days=options["years"] * 365)
+        max_per_day = max(1, round(options["per_day"] * 2))
+
+        expenses = []
+        bill_items = []
+        date = first_day
+        while date <= today:
+            for _ in range(rng.randint(0, max_per_day)):
+                vendor = pick_vendor()
+                expense = Expense(user=user, date=date, vendor=vendor, category=pick_category())
+                if rng.random() < options["bills"]:
+                    items = [
+                        BillItem(
+                            user=user,
+                            product=pick_product(),
+                            serving=decimal.Decimal(rng.choice([1, 100, 250, 500, 1000])),
+                            count=decimal.Decimal(rng.randint(1, 4)),
+                            unit_price=decimal.Decimal(rng.randint(99, 4999)).scaleb(-2),
+                        )
+                        for _ in range(rng.randint(1, 8))
+                    ]
+                    expense.is_bill = True
+                    expense.amount = sum(round_money(i.count * i.unit_price) for i in items)
+                    expense.description_cache = Truncator(", ".join(i.product for i in items)).chars(300)
+                    bill_items.append((expense, items))
+                else:
+                    expense.amount = decimal.Decimal(int(rng.paretovariate(1.5) * 500)).scaleb(-2)
+                    expense.description = f"Purchase at {vendor}"
+                    expense.description_cache = expense.description
+                expenses.append(expense)
+            date += datetime.timedelta(days=1)
+
+        Expense.objects.bulk_create(expenses, batch_size=BATCH_SIZE)
+        items_to_create = []
+        for bill, items in bill_items:
+            for item in items:
+                item.bill = bill
+                items_to_create.append(item)
+        BillItem.objects.bulk_create(items_to_create, batch_size=BATCH_SIZE)
+
+        templates = [
+            ExpenseTemplate(
+                user=user,
+                name=f"Template {n}",
+                vendor=pick_vendor(),
+                category=pick_category(),
+                type=template_type,
+                amount=None if template_type == "menu" else decimal.Decimal(rng.randint(100, 10000)).scaleb(-2),
+                description=description,
+            )
+            for n, (template_type, description) in enumerate(
+                [
+                    ("simple", "Monthly pass"),
+                    ("count", "!count! ticket\n!count! tickets\n!count! tickets"),
+                    ("description", "Lunch: !description!"),
+                    ("desc_select", "Coffee: !description!\nEspresso\nLatte\nCappuccino"),
+                    ("menu", "5.50 Soup\n12.00 Main course\n3.00 Dessert"),
+                ],
+                1,
+            )
+        ]
+        ExpenseTemplate.objects.bulk_create(templates)
+
+        deletion_records = [
+            DeletionRecord(user=user, model="expense", object_pk=rng.randint(1, 10**9))
+            for _ in range(len(expenses) // 50)
+        ]
+        DeletionRecord.objects.bulk_create(deletion_records, batch_size=BATCH_SIZE)
+        # auto_now_add sets the date on insert, so the records are spread over the history afterwards.
+        # Dates follow the IDs, as with real deletion records.
+        now = timezone.now()
+        span = options["years"] * 365 * 86400
+        dates = sorted(now - datetime.timedelta(seconds=rng.randrange(span)) for _ in deletion_records)
+        deletion_records = list(DeletionRecord.objects.filter(user=user).order_by("pk"))
+        for record, date in zip(deletion_records, dates):
+            record.date = date
+        DeletionRecord.objects.bulk_update(deletion_records, ["date"], batch_size=BATCH_SIZE)
+
+        return {
+            "categories": len(categories),
+            "expenses": len(expenses),
+            "bill items": len(items_to_create),
+            "templates": len(templates),
+            "deletion records": len(deletion_records),
+        }
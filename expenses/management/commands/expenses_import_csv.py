@@ -0,0 +1,41 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.imports import ImportFileError, import_expenses
+from expenses.models import ImportMapping
+
+
+class Command(BaseCommand):
+    help = "Import expenses from a CSV file, with the user’s saved import settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="CSV file to import.")
+        parser.add_argument("--user", required=True, help="Username to import the expenses for.")
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        user = user_model.objects.filter(**{user_model.USERNAME_FIELD: options["user"]}).first()
+        if user is None:
+            raise CommandError("User not found.")
+        mapping = ImportMapping.objects.filter(user=user).first() or ImportMapping(user=user)
+
+        def progress(result):
+            self.stdout.write(f"{result.rows} rows read, {result.imported} imported")
+
+        try:
+            with open(options["file"], "rb") as fh:
+                result = import_expenses(user, fh, mapping, progress)
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"Imported {result.imported} expenses from {result.rows} rows "
+            f"({result.duplicates} duplicates, {result.skipped} skipped, {result.error_count} errors)."
+        )
+        for line, message in result.errors:
+            self.stdout.write(f"Line {line}: {message}")
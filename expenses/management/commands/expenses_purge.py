@@ -0,0 +1,39 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.purge import purge_user_data
+
+
+class Command(BaseCommand):
+    help = "Delete all expenses, bills, templates and categories of a user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username to purge the data of.")
+        parser.add_argument(
+            "--delete-user", action="store_true", help="Delete the user as well (no deletion records are kept)."
+        )
+        parser.add_argument(
+            "--noinput", "--no-input", action="store_false", dest="interactive", help="Do not ask for confirmation."
+        )
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        user = user_model.objects.filter(**{user_model.USERNAME_FIELD: options["user"]}).first()
+        if user is None:
+            raise CommandError("User not found.")
+        if options["interactive"]:
+            what = "the user and all their data" if options["delete_user"] else "all data of the user"
+            confirm = input(f"This will permanently delete {what}. Type 'yes' to continue: ")
+            if confirm != "yes":
+                raise CommandError("Purge cancelled.")
+
+        def progress(name, deleted):
+            self.stdout.write(f"{name}: {deleted} deleted")
+
+        counts = purge_user_data(user, options["delete_user"], progress=progress)
+        self.stdout.write(f"Purged {sum(counts.values())} objects.")
@@ -0,0 +1,48 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.models import Expense
+from expenses.rebuild import rebuild_derived_fields
+
+
+class Command(BaseCommand):
+    help = "Recompute description caches and bill amounts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to rebuild the expenses of (default: all users).")
+        parser.add_argument("--from", dest="date_from", help="Rebuild expenses from this date (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="date_to", help="Rebuild expenses up to this date (YYYY-MM-DD).")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be fixed.")
+
+    def handle(self, *args, **options):
+        expenses = Expense.objects.all()
+        if options["user"] is not None:
+            user_model = get_user_model()
+            user = user_model.objects.filter(**{user_model.USERNAME_FIELD: options["user"]}).first()
+            if user is None:
+                raise CommandError("User not found.")
+            expenses = expenses.filter(user=user)
+        try:
+            if options["date_from"]:
+                expenses = expenses.filter(date__gte=datetime.date.fromisoformat(options["date_from"]))
+            if options["date_to"]:
+                expenses = expenses.filter(date__lte=datetime.date.fromisoformat(options["date_to"]))
+        except ValueError:
+            raise CommandError("Invalid date.")
+
+        def progress(result):
+            self.stdout.write(f"{result.bills_checked} bills checked, {result.bills} wrong")
+
+        result = rebuild_derived_fields(expenses, options["dry_run"], progress=progress)
+        verb = "Would fix" if options["dry_run"] else "Fixed"
+        self.stdout.write(
+            f"{verb} {result.descriptions} description caches and {result.bills} bills "
+            f"(of {result.bills_checked} checked)."
+        )
@@ -0,0 +1,31 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.backup import RestoreError, restore_archive
+
+
+class Command(BaseCommand):
+    help = "Restore an exported archive into an empty account."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Archive to restore.")
+        parser.add_argument("--user", required=True, help="Username to restore the data for.")
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        user = user_model.objects.filter(**{user_model.USERNAME_FIELD: options["user"]}).first()
+        if user is None:
+            raise CommandError("User not found.")
+
+        try:
+            with open(options["file"], "rb") as fh:
+                counts = restore_archive(user, fh)
+        except (OSError, RestoreError) as exc:
+            raise CommandError(str(exc))
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
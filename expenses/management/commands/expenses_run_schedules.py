@@ -0,0 +1,27 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.schedules import materialize_due_templates
+
+
+class Command(BaseCommand):
+    help = "Add the expenses of all scheduled templates that are due."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Add expenses due by this date (YYYY-MM-DD, default: today).")
+
+    def handle(self, *args, **options):
+        today = None
+        if options["date"]:
+            try:
+                today = datetime.date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("Invalid date.")
+        count = materialize_due_templates(today)
+        self.stdout.write(f"Added {count} scheduled expenses.")
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0018_apikey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billitem',
+            index=models.Index(fields=['user', 'date_modified'], name='expenses_bi_user_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletionrecord',
+            index=models.Index(fields=['user', 'date'], name='expenses_dr_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-date', '-date_added', '-id'], name='expenses_ex_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date_modified'], name='expenses_ex_user_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'vendor'], name='expenses_ex_user_vendor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('is_bill', True)), fields=['user', '-date_added'], name='expenses_ex_user_bills_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0020_dataversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expensetemplate',
+            name='schedule',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('monthly', 'Monthly'), ('weekly', 'Weekly')], default='', max_length=20, verbose_name='Schedule'),
+        ),
+        migrations.AddField(
+            model_name='expensetemplate',
+            name='schedule_day',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Schedule day'),
+        ),
+        migrations.AddField(
+            model_name='expensetemplate',
+            name='schedule_last_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Last scheduled date'),
+        ),
+        migrations.AddField(
+            model_name='expensetemplate',
+            name='schedule_next_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Next scheduled date'),
+        ),
+        migrations.AddIndex(
+            model_name='expensetemplate',
+            index=models.Index(condition=models.Q(('schedule_next_date__isnull', False)), fields=['schedule_next_date'], name='expenses_et_schedule_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0021_template_schedules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportMapping',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('encoding', models.CharField(default='utf-8', max_length=20, verbose_name='Encoding')),
+                ('delimiter', models.CharField(choices=[(',', 'Comma'), (';', 'Semicolon'), ('\t', 'Tab'), ('|', 'Vertical bar')], default=',', max_length=1, verbose_name='Delimiter')),
+                ('date_column', models.CharField(default='Date', max_length=80, verbose_name='Date column')),
+                ('date_format', models.CharField(default='%Y-%m-%d', max_length=40, verbose_name='Date format')),
+                ('vendor_column', models.CharField(default='Vendor', max_length=80, verbose_name='Vendor column')),
+                ('amount_column', models.CharField(default='Amount', max_length=80, verbose_name='Amount column')),
+                ('description_column', models.CharField(blank=True, default='Description', max_length=80, verbose_name='Description column')),
+                ('category_column', models.CharField(blank=True, default='Category', max_length=80, verbose_name='Category column')),
+                ('negate_amounts', models.BooleanField(default=False, verbose_name='Expenses are negative amounts')),
+                ('default_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='expenses.category', verbose_name='Default category')),
+            ],
+        ),
+    ]
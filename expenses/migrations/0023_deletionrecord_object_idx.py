@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0022_importmapping'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deletionrecord',
+            index=models.Index(fields=['user', 'model', 'object_pk'], name='expenses_dr_user_object_idx'),
+        ),
+    ]
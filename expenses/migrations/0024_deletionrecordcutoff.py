@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0023_deletionrecord_object_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionRecordCutoff',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField()),
+            ],
+        ),
+    ]
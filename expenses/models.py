@@ -3,17 +3,25 @@
 # All rights reserved.
 # See /LICENSE for licensing information.
 
+import collections
 import datetime
+import decimal
+import typing
 
 from django.conf import settings
 from django.dispatch import receiver
+from django.utils import timezone
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.text import slugify, Truncator
 from django.utils.translation import gettext_lazy as _
-from django.db import models, connection
+from django.db import models, connection, transaction
 
 
+from expenses.caching import batch_data_version_bumps, bump_data_version, bump_data_versions
+from expenses.category_registry import invalidate_category_registry
+from expenses.schedules import SCHEDULE_CHOICES, SCHEDULED_TYPES, next_occurrence
+from expenses.template_plans import RunPlan, compile_run_plan
 from expenses.utils import (
     round_money,
     serialize_dt,
@@ -23,13 +31,44 @@ from expenses.utils import (
     parse_date,
     parse_decimal,
     format_money,
+    today_date,
 )
 
 
+class DataVersion(models.Model):
+    """The version of a user’s data, changed on every write (see expenses.caching)."""
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, models.CASCADE, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return "<DataVersion {} for user {}>".format(self.version, self.user_id)
+
+
+class ExpensesQuerySet(models.QuerySet):
+    """A QuerySet that changes the data version of users affected by bulk creates and deletes.
+
+    ``update`` and ``bulk_update`` do not know the affected users without an
+    extra query, so their callers must call ``bump_data_versions``.
+    """
+
+    def delete(self):
+        # Every deleted object (including cascades) sends a signal; bump each user once.
+        with transaction.atomic(using=self.db, savepoint=False), batch_data_version_bumps():
+            return super().delete()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bump_data_versions({obj.user_id for obj in objs})
+        return objs
+
+
 class ExpensesModel(models.Model):
     class Meta:
         abstract = True
 
+    objects = ExpensesQuerySet.as_manager()
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, models.CASCADE)
     date_added = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
@@ -58,10 +97,22 @@ class ExpensesModel(models.Model):
     def fields_from_json(self, data: dict) -> None:
         pass
 
+    def save(self, *args, **kwargs):
+        # Signal receivers update bills and data versions; commit their writes together
+        # with the object, like Django does for deletions.
+        with transaction.atomic(savepoint=False), batch_data_version_bumps():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Every deleted object (including cascades) sends a signal; bump the user once.
+        with transaction.atomic(savepoint=False), batch_data_version_bumps():
+            return super().delete(*args, **kwargs)
+
     def delete_at(self, date: datetime.datetime):
-        dr = DeletionRecord(model=MODEL_TO_STR_MAP[self.__class__], object_pk=self.pk, user=self.user, date=date)
-        dr.save()
-        self.delete()
+        with transaction.atomic(), batch_data_version_bumps():
+            dr = DeletionRecord(model=MODEL_TO_STR_MAP[self.__class__], object_pk=self.pk, user=self.user, date=date)
+            dr.save()
+            self.delete()
 
 
 class Category(ExpensesModel):
@@ -123,14 +174,30 @@ class Category(ExpensesModel):
         """Get ordered category objects for a user."""
         return cls.objects.filter(user=request.user).order_by("order")
 
-    def prepare_deletion(self, dest, user):
-        try:
-            new_cat = Category.objects.get(pk=int(dest), user=user)
-            self.expense_set.update(category=new_cat)
-            self.expensetemplate_set.update(category=new_cat)
-            return True
-        except (Category.DoesNotExist, ValueError):
-            return False
+    def merge_into(self, dest) -> bool:
+        """Move all expenses and templates to the category with ID dest, and delete this category.
+
+        Everything happens in one transaction. Moved items get a new
+        modification date, so that sync clients pick them up. Returns False
+        (and changes nothing) if dest is not another category of the same
+        user, unless this category is empty.
+        """
+        with transaction.atomic(), batch_data_version_bumps():
+            try:
+                new_cat = (
+                    Category.objects.select_for_update().exclude(pk=self.pk).get(pk=int(dest), user_id=self.user_id)
+                )
+            except (Category.DoesNotExist, TypeError, ValueError):
+                new_cat = None
+            if new_cat is not None:
+                now = timezone.now()
+                self.expense_set.update(category=new_cat, date_modified=now)
+                self.expensetemplate_set.update(category=new_cat, date_modified=now)
+                bump_data_version(self.user_id)
+            elif self.expense_set.exists() or self.expensetemplate_set.exists():
+                return False
+            self.delete()
+        return True
 
     def fields_to_json(self) -> dict:
         return {
@@ -144,6 +211,20 @@ class Category(ExpensesModel):
 
 
 class Expense(ExpensesModel):
+    class Meta:
+        indexes = [
+            # Expense lists, the dashboard and date-range reports
+            models.Index(fields=["user", "-date", "-date_added", "-id"], name="expenses_ex_user_date_idx"),
+            # Sync (changes since the last sync)
+            models.Index(fields=["user", "date_modified"], name="expenses_ex_user_modified_idx"),
+            # Vendor autocomplete
+            models.Index(fields=["user", "vendor"], name="expenses_ex_user_vendor_idx"),
+            # Recent bill vendors
+            models.Index(
+                fields=["user", "-date_added"], name="expenses_ex_user_bills_idx", condition=models.Q(is_bill=True)
+            ),
+        ]
+
     date = models.DateField(_("Date"), default=datetime.date.today)
     vendor = models.CharField(_("Vendor"), max_length=40)
     category = models.ForeignKey(Category, verbose_name=_("Category"), on_delete=models.PROTECT)
@@ -162,10 +243,7 @@ class Expense(ExpensesModel):
         return reverse("expenses:bill_show" if self.is_bill else "expenses:expense_show", args=[self.pk])
 
     def calculate_bill_total(self):
-        sum = 0
-        for b in self.billitem_set.all():
-            sum += b.amount
-        return sum
+        return bill_total((b.count, b.unit_price) for b in self.billitem_set.all())
 
     def generate_bill_description_full(self):
         if self.billitem_set.count() == 0:
@@ -174,7 +252,7 @@ class Expense(ExpensesModel):
 
     def generate_bill_description(self):
         """Generate a bill description, truncating it to the database limit."""
-        return Truncator(self.generate_bill_description_full()).chars(300)
+        return bill_description(i.product for i in self.billitem_set.all())
 
     @property
     def desc_auto(self):
@@ -202,6 +280,9 @@ class Expense(ExpensesModel):
 
 
 class BillItem(ExpensesModel):
+    class Meta:
+        indexes = [models.Index(fields=["user", "date_modified"], name="expenses_bi_user_modified_idx")]
+
     bill = models.ForeignKey(Expense, verbose_name=_("Bill"), on_delete=models.CASCADE)
     product = models.CharField(_("Product"), max_length=40)
     serving = models.DecimalField(_("Serving"), max_digits=10, decimal_places=3, null=True)
@@ -246,6 +327,16 @@ TEMPLATE_TYPE_CHOICES_LOOKUP = {k: v for k, v in TEMPLATE_TYPE_CHOICES}
 
 
 class ExpenseTemplate(ExpensesModel):
+    class Meta:
+        indexes = [
+            # Due scheduled templates
+            models.Index(
+                fields=["schedule_next_date"],
+                name="expenses_et_schedule_idx",
+                condition=models.Q(schedule_next_date__isnull=False),
+            ),
+        ]
+
     name = models.CharField(_("Name"), max_length=40)
     vendor = models.CharField(_("Vendor"), max_length=40)
     category = models.ForeignKey(Category, verbose_name=_("Category"), on_delete=models.PROTECT)
@@ -253,6 +344,10 @@ class ExpenseTemplate(ExpensesModel):
     amount = models.DecimalField(_("Amount"), max_digits=10, decimal_places=2, null=True)
     description = models.CharField(_("Description"), max_length=400)
     comment = models.TextField(_("Comment"), blank=True)
+    schedule = models.CharField(_("Schedule"), max_length=20, choices=SCHEDULE_CHOICES, blank=True, default="")
+    schedule_day = models.PositiveSmallIntegerField(_("Schedule day"), null=True, blank=True)
+    schedule_last_date = models.DateField(_("Last scheduled date"), null=True, blank=True)
+    schedule_next_date = models.DateField(_("Next scheduled date"), null=True, blank=True)
 
     def get_absolute_url(self):
         return reverse("expenses:template_show", args=[self.pk])
@@ -269,14 +364,31 @@ class ExpenseTemplate(ExpensesModel):
     def __repr__(self):
         return '<ExpenseTemplate "{0}">'.format(self.name)
 
+    @property
+    def run_plan(self) -> RunPlan:
+        """The parsed description (memoized)."""
+        return compile_run_plan(self.type, self.description)
+
     def description_choices(self):
         """A list of choices for the description."""
-        if self.type == "desc_select":
-            return [opt.strip() for opt in self.description.split("\n")[1:]]
-        elif self.type == "menu":
-            return [opt.strip() for opt in self.description.split("\n")]
+        if self.type in {"desc_select", "menu"}:
+            return self.run_plan.choices
         raise ValueError(f"Description choices not available for {self.type} templates")
 
+    def scheduled_expense(self, date: datetime.date) -> "Expense":
+        """Build the expense added by the schedule on a date."""
+        amount, description = self.run_plan.run(self.amount, {})
+        return Expense(
+            user_id=self.user_id,
+            date=date,
+            vendor=self.vendor,
+            category_id=self.category_id,
+            amount=amount,
+            description=description,
+            # bulk_create does not send pre_save
+            description_cache=description,
+        )
+
     def display_amount(self):
         """A displayable version of the amount."""
         if self.type == "menu":
@@ -328,7 +440,43 @@ DELETIONRECORD_MODEL_CHOICES = (
 )
 
 
+CSV_DELIMITER_CHOICES = (
+    (",", _("Comma")),
+    (";", _("Semicolon")),
+    ("\t", _("Tab")),
+    ("|", _("Vertical bar")),
+)
+
+
+class ImportMapping(models.Model):
+    """Saved CSV import settings of a user (see expenses.imports)."""
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, models.CASCADE, primary_key=True)
+    encoding = models.CharField(_("Encoding"), max_length=20, default="utf-8")
+    delimiter = models.CharField(_("Delimiter"), max_length=1, choices=CSV_DELIMITER_CHOICES, default=",")
+    date_column = models.CharField(_("Date column"), max_length=80, default="Date")
+    date_format = models.CharField(_("Date format"), max_length=40, default="%Y-%m-%d")
+    vendor_column = models.CharField(_("Vendor column"), max_length=80, default="Vendor")
+    amount_column = models.CharField(_("Amount column"), max_length=80, default="Amount")
+    description_column = models.CharField(_("Description column"), max_length=80, blank=True, default="Description")
+    category_column = models.CharField(_("Category column"), max_length=80, blank=True, default="Category")
+    default_category = models.ForeignKey(
+        Category, verbose_name=_("Default category"), on_delete=models.SET_NULL, null=True, blank=True
+    )
+    negate_amounts = models.BooleanField(_("Expenses are negative amounts"), default=False)
+
+    def __str__(self):
+        return "<ImportMapping for user {}>".format(self.user_id)
+
+
 class DeletionRecord(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="expenses_dr_user_date_idx"),
+            # Lookups of deleted objects in sync
+            models.Index(fields=["user", "model", "object_pk"], name="expenses_dr_user_object_idx"),
+        ]
+
     model = models.CharField(max_length=20, choices=DELETIONRECORD_MODEL_CHOICES)
     object_pk = models.IntegerField()
     user = models.ForeignKey(settings.AUTH_USER_MODEL, models.CASCADE)
@@ -341,6 +489,18 @@ class DeletionRecord(models.Model):
         return {"model": self.model, "object": self.object_pk, "date": self.date}
 
 
+class DeletionRecordCutoff(models.Model):
+    """The date before which deletion records may have been removed (see expenses.deletion_records).
+
+    There is at most one row, saved by every compaction.
+    """
+
+    date = models.DateTimeField()
+
+    def __str__(self):
+        return "<DeletionRecordCutoff {}>".format(self.date)
+
+
 STR_TO_MODEL_MAP = {
     "category": Category,
     "expense": Expense,
@@ -364,34 +524,78 @@ STR_TO_DATA_MODEL_MAP = {k: v for k, v in STR_TO_MODEL_MAP.items() if k != "dele
 
 
 # Code from the Achieve project.
+def bill_total(items: typing.Iterable[typing.Tuple[decimal.Decimal, decimal.Decimal]]):
+    """Get the total amount of bill items, given as (count, unit price) pairs."""
+    return sum((round_money(count * unit_price) for count, unit_price in items), 0)
+
+
+def bill_description(products: typing.Iterable[str]) -> str:
+    """Get the description of a bill with some products, truncated to the database limit."""
+    products = list(products)
+    if not products:
+        return str(_("(empty)"))
+    return Truncator(", ".join(products)).chars(300)
+
+
+def find_free_slug(instance: Category, slugbase: str, samebase: typing.List[Category]) -> str:
+    """Find a slug for a category, given the other categories with the same slug base."""
+    # The slugbase is used to identify things with the same slug base.
+    if not samebase:
+        # New slug base.
+        return slugbase
+    elif len(samebase) == 1 and samebase[0] == instance:
+        # (If forced) only slug like this.
+        return slugbase
+    # We need to find a new slug for ourselves.
+    others = [c for c in samebase if c.slug != slugbase]
+    if others:
+        nums = [int(c.slug.split("-")[-1]) for c in others]
+        final_num = max(nums) + 1
+    else:
+        final_num = 1
+    return "{0}-{1}".format(slugbase, final_num)
+
+
+def assign_slugs(changed: typing.Iterable[Category], existing: typing.Iterable[Category]) -> None:
+    """Update slugs of changed (or new) categories in memory, as if they were saved one by one.
+
+    existing must contain all saved categories of the user.
+    """
+    by_slugbase = collections.defaultdict(list)
+    for c in existing:
+        by_slugbase[c.slugbase].append(c)
+    for instance in changed:
+        slugbase = slugify(instance.name)
+        if slugbase == instance.slugbase:
+            continue
+        slug = find_free_slug(instance, slugbase, by_slugbase[slugbase])
+        by_slugbase[instance.slugbase] = [c for c in by_slugbase[instance.slugbase] if c is not instance]
+        by_slugbase[slugbase].append(instance)
+        instance.slugbase = slugbase
+        instance.slug = slug
+
+
 @receiver(models.signals.pre_save, sender=Category)
 def update_slug(sender, instance: Category, **kwargs):  # NOQA
     """Update the slug for an item."""
-    # The slugbase is used to identify things with the same slug base.
     slugbase = slugify(instance.name)
     if slugbase == instance.slugbase:
         # Assuming DB consistency, the slug is fine
         return
 
-    samebase = sender.objects.filter(user=instance.user, slugbase=slugbase)
-    if not samebase:
-        # New slug base.
-        final_slug = slugbase
-    elif len(samebase) == 1 and samebase[0] == instance:
-        # (If forced) only slug like this.
-        final_slug = slugbase
-    else:
-        # We need to find a new slug for ourselves.
-        others = samebase.exclude(slug=slugbase)
-        if others:
-            nums = [int(i.slug.split("-")[-1]) for i in others.all()]
-            final_num = max(nums) + 1
-        else:
-            final_num = 1
-        final_slug = "{0}-{1}".format(slugbase, final_num)
-
+    samebase = list(sender.objects.filter(user=instance.user, slugbase=slugbase))
+    instance.slug = find_free_slug(instance, slugbase, samebase)
     instance.slugbase = slugbase
-    instance.slug = final_slug
+
+
+@receiver(models.signals.pre_save, sender=ExpenseTemplate)
+def update_template_schedule(instance: ExpenseTemplate, **kwargs):
+    """Find the next due date of a scheduled template."""
+    if not instance.schedule or not instance.schedule_day or instance.type not in SCHEDULED_TYPES:
+        instance.schedule_next_date = None
+        return
+    after = instance.schedule_last_date or today_date() - datetime.timedelta(days=1)
+    instance.schedule_next_date = next_occurrence(instance.schedule, instance.schedule_day, after)
 
 
 @receiver(models.signals.post_save, sender=BillItem)
@@ -426,3 +630,23 @@ def update_bill_info_on_bill_save(instance: Expense, **kwargs):
 @receiver(models.signals.pre_delete, sender=ApiKey)
 def create_deletion_record(instance, sender, **kwargs):
     DeletionRecord.objects.get_or_create(model=MODEL_TO_STR_MAP[sender], object_pk=instance.pk, user=instance.user)
+
+
+@receiver(models.signals.post_save, sender=Category)
+@receiver(models.signals.post_save, sender=Expense)
+@receiver(models.signals.post_save, sender=BillItem)
+@receiver(models.signals.post_save, sender=ExpenseTemplate)
+@receiver(models.signals.post_delete, sender=Category)
+@receiver(models.signals.post_delete, sender=Expense)
+@receiver(models.signals.post_delete, sender=BillItem)
+@receiver(models.signals.post_delete, sender=ExpenseTemplate)
+@receiver(models.signals.post_save, sender=ApiKey)
+@receiver(models.signals.post_delete, sender=ApiKey)
+def bump_user_data_version(instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(models.signals.post_save, sender=Category)
+@receiver(models.signals.post_delete, sender=Category)
+def invalidate_user_category_registry(instance: Category, **kwargs):
+    invalidate_category_registry(instance.user_id, instance._state.fields_cache.get("user"))
@@ -6,9 +6,14 @@
 from itertools import zip_longest
 
 
-def pagination(num, maxpage):
-    """Generate a pretty pagination."""
-    if maxpage <= 5:
+def pagination(num, maxpage, approximate=False):
+    """Generate a pretty pagination.
+
+    If approximate is set, maxpage is a lower bound, and the last page is
+    replaced by an ellipsis."""
+    if approximate:
+        maxpage = max(maxpage, num + 1)
+    elif maxpage <= 5:
         return list(range(1, maxpage + 1))
 
     page_range = []
@@ -18,7 +23,7 @@ def pagination(num, maxpage):
         around = {num - 2, num - 1, num}
     else:
         around = {num - 1, num, num + 1}
-    around |= {1, maxpage}
+    around |= {1} if approximate else {1, maxpage}
     page_range_base = [i for i in sorted(around) if 0 < i <= maxpage]
     for current_page, next_page in zip_longest(page_range_base, page_range_base[1:]):
         page_range.append(current_page)
@@ -31,6 +36,8 @@ def pagination(num, maxpage):
         elif diff > 2:
             page_range.append("...")
 
+    if approximate:
+        page_range.append("...")
     return page_range
 
 
@@ -39,3 +46,6 @@ if __name__ == "__main__":
     print("Pages:", maxpage)
     for i in range(1, maxpage + 1):
         print(i, pagination(i, maxpage), sep="\t")
+    print("Approximate:")
+    for i in range(1, maxpage + 1):
+        print(i, pagination(i, maxpage, True), sep="\t")
@@ -0,0 +1,106 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Purging accounts.
+
+Deleting objects with the ORM collects every related object into memory and
+sends signals for each of them (which, for expenses, write a deletion record
+row by row). This is fine for single objects, but not for whole accounts. A
+purge deletes the data of a user table by table, children before parents,
+with plain ``DELETE`` queries on chunks of primary keys. No signals are sent.
+
+If the account is kept, deletion records for the deleted objects are
+inserted in bulk, so that sync clients remove them too. If the user is being
+deleted, no deletion records are written, and deletion records, API keys and
+settings are purged as well, so that deleting the user has little left to do.
+
+Every chunk is committed separately, so a purge does not hold long locks. An
+interrupted purge can be run again to finish it.
+"""
+
+import typing
+
+from django.db import router, transaction
+
+from expenses.caching import bump_data_version
+from expenses.category_registry import invalidate_category_registry
+
+CHUNK_SIZE = 5000
+
+
+def _purge_model(
+    model,
+    user_id: int,
+    record_deletions: bool,
+    chunk_size: int,
+    progress: typing.Optional[typing.Callable[[str, int], None]],
+) -> int:
+    """Delete all objects of a model owned by a user, in chunks. Returns the number of deleted objects."""
+    from expenses.models import MODEL_TO_STR_MAP, DeletionRecord
+
+    name = MODEL_TO_STR_MAP.get(model, model._meta.model_name)
+    using = router.db_for_write(model)
+    queryset = model.objects.filter(user_id=user_id).order_by("pk")
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            pks = list(queryset.values_list("pk", flat=True)[:chunk_size])
+            if not pks:
+                break
+            if record_deletions:
+                DeletionRecord.objects.bulk_create(
+                    [DeletionRecord(model=name, object_pk=pk, user_id=user_id) for pk in pks]
+                )
+            # _raw_delete is a single DELETE, without collecting related objects or sending signals.
+            deleted += model.objects.filter(pk__in=pks)._raw_delete(using)
+        if progress is not None:
+            progress(name, deleted)
+    return deleted
+
+
+def purge_user_data(
+    user,
+    delete_user: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    progress: typing.Optional[typing.Callable[[str, int], None]] = None,
+) -> typing.Dict[str, int]:
+    """Delete all expenses, bills, templates and categories of a user. Returns the number of deleted objects.
+
+    If delete_user is True, deletion records, API keys and saved settings
+    are deleted too, followed by the user. progress is called with the model
+    name and the number of objects deleted so far after every chunk.
+    """
+    from expenses.models import (
+        ApiKey,
+        BillItem,
+        Category,
+        DataVersion,
+        DeletionRecord,
+        Expense,
+        ExpenseTemplate,
+        ImportMapping,
+    )
+
+    user_id = user.pk
+    record_deletions = not delete_user
+    # Children before parents: bill items refer to bills, expenses and templates to categories.
+    models = [BillItem, Expense, ExpenseTemplate]
+    if delete_user:
+        models += [ImportMapping, Category, ApiKey, DeletionRecord, DataVersion]
+    else:
+        # The saved import settings are kept, without the category.
+        ImportMapping.objects.filter(user_id=user_id).update(default_category=None)
+        models.append(Category)
+
+    counts = {}
+    for model in models:
+        counts[model._meta.model_name] = _purge_model(model, user_id, record_deletions, chunk_size, progress)
+
+    if delete_user:
+        user.delete()
+    else:
+        bump_data_version(user_id)
+    invalidate_category_registry(user_id, user)
+    return counts
@@ -0,0 +1,90 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Query plan checks.
+
+Runs ``EXPLAIN`` on the hot queries of the app and checks that each of them
+uses the index meant for it. Supports SQLite and PostgreSQL. PostgreSQL
+prefers sequential scans on small tables, so they are disabled while
+checking.
+"""
+
+import datetime
+import typing
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+SUPPORTED_VENDORS = ("sqlite", "postgresql")
+
+
+def _hot_queries(user_id: int) -> typing.Dict[str, typing.Tuple[str, typing.Union[QuerySet, tuple]]]:
+    """Get the hot queries as {name: (expected index, queryset or (sql, params))}."""
+    from expenses.keyset import EXPENSE_ORDERING, KeysetPaginator
+    from expenses.models import BillItem, DeletionRecord, Expense
+    from expenses.views.bill import LAST_VENDORS_QUERY
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    week_ago = now - datetime.timedelta(days=7)
+    today = now.date()
+    expenses = Expense.objects.filter(user_id=user_id)
+    paginator = KeysetPaginator(expenses, EXPENSE_ORDERING, 20, user_id, "expense_list")
+    return {
+        "expense_list": ("expenses_ex_user_date_idx", expenses.order_by(*EXPENSE_ORDERING)[:21]),
+        "expense_list_next_page": ("expenses_ex_user_date_idx", paginator.seek([today, now, 0])[:21]),
+        "expense_date_range": (
+            "expenses_ex_user_date_idx",
+            expenses.filter(date__gte=today.replace(day=1), date__lte=today).values_list("amount"),
+        ),
+        "sync_expenses": (
+            "expenses_ex_user_modified_idx",
+            expenses.filter(date_modified__gt=week_ago, date_modified__lte=now).order_by("id"),
+        ),
+        "sync_billitems": (
+            "expenses_bi_user_modified_idx",
+            BillItem.objects.filter(user_id=user_id, date_modified__gt=week_ago, date_modified__lte=now).order_by("id"),
+        ),
+        "sync_deletions": (
+            "expenses_dr_user_date_idx",
+            DeletionRecord.objects.filter(user_id=user_id, date__gt=week_ago, date__lte=now),
+        ),
+        "sync_deleted_object": (
+            "expenses_dr_user_object_idx",
+            DeletionRecord.objects.filter(user_id=user_id, model="expense", object_pk=1),
+        ),
+        "autocomplete_vendor": (
+            "expenses_ex_user_vendor_idx",
+            expenses.filter(vendor__istartswith="V").values_list("vendor", flat=True).distinct()[:10],
+        ),
+        "last_bill_vendors": ("expenses_ex_user_bills_idx", (LAST_VENDORS_QUERY, [user_id])),
+    }
+
+
+def explain(query: typing.Union[QuerySet, tuple]) -> str:
+    """Get the query plan of a queryset or a (sql, params) pair."""
+    if isinstance(query, QuerySet):
+        return query.explain()
+    sql, params = query
+    with connection.cursor() as cursor:
+        cursor.execute(connection.ops.explain_query_prefix() + " " + sql, params)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def check_query_plans(user_id: int) -> typing.Dict[str, typing.Tuple[bool, str, str]]:
+    """Explain every hot query.
+
+    Returns {name: (index used?, expected index, plan)}.
+    """
+    if connection.vendor not in SUPPORTED_VENDORS:
+        raise NotImplementedError(f"Query plans cannot be checked on {connection.vendor}.")
+    results = {}
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        for name, (index, query) in _hot_queries(user_id).items():
+            plan = explain(query)
+            results[name] = (index in plan, index, plan)
+    return results
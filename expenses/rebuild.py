@@ -0,0 +1,97 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Rebuilding derived fields.
+
+Expenses store some values derived from other data: the description cache
+(the description, or for bills without one, the list of products) and bill
+amounts (the total of the bill items). They are kept up to date by signals,
+but can drift after direct database edits or changes to how they are
+computed. This recomputes them without saving rows one by one: expenses with
+their own description are fixed with one UPDATE, and bills are checked in
+chunks (with the items of a chunk loaded in one query) and fixed with
+``bulk_update``. Fixed rows get a new modification date, so that sync
+clients pick them up.
+"""
+
+import collections
+import typing
+
+import attr
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from expenses.caching import bump_data_versions
+
+CHUNK_SIZE = 1000
+
+
+@attr.s(auto_attribs=True)
+class RebuildResult:
+    descriptions: int = 0
+    bills: int = 0
+    bills_checked: int = 0
+
+
+def rebuild_derived_fields(
+    expenses: QuerySet,
+    dry_run: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    progress: typing.Optional[typing.Callable[[RebuildResult], None]] = None,
+) -> RebuildResult:
+    """Recompute description caches and bill amounts of some expenses. Returns the number of fixed rows."""
+    from expenses.models import BillItem, Expense, bill_description, bill_total
+
+    result = RebuildResult()
+    now = timezone.now()
+
+    described = expenses.exclude(is_bill=True, description="").exclude(description_cache=F("description"))
+    if dry_run:
+        result.descriptions = described.count()
+    else:
+        with transaction.atomic():
+            result.descriptions = described.update(description_cache=F("description"), date_modified=now)
+            if result.descriptions:
+                bump_data_versions(expenses.order_by().values_list("user_id", flat=True).distinct())
+
+    bills = expenses.filter(is_bill=True).order_by("pk")
+    last_pk = None
+    while True:
+        chunk_qs = bills if last_pk is None else bills.filter(pk__gt=last_pk)
+        chunk = list(chunk_qs.values_list("pk", "user_id", "amount", "description", "description_cache")[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        items = collections.defaultdict(list)
+        item_rows = (
+            BillItem.objects.filter(bill_id__in=[row[0] for row in chunk])
+            .order_by("pk")
+            .values_list("bill_id", "product", "count", "unit_price")
+        )
+        for bill_id, product, count, unit_price in item_rows:
+            items[bill_id].append((product, count, unit_price))
+
+        fixed = []
+        fixed_user_ids = set()
+        for pk, user_id, amount, description, description_cache in chunk:
+            bill_items = items.get(pk, [])
+            new_amount = bill_total((count, unit_price) for _product, count, unit_price in bill_items)
+            if description:
+                new_cache = description
+            else:
+                new_cache = bill_description(product for product, _count, _unit_price in bill_items)
+            if new_amount != amount or new_cache != description_cache:
+                fixed.append(Expense(pk=pk, amount=new_amount, description_cache=new_cache, date_modified=now))
+                fixed_user_ids.add(user_id)
+        if fixed and not dry_run:
+            with transaction.atomic():
+                Expense.objects.bulk_update(fixed, ["amount", "description_cache", "date_modified"])
+                bump_data_versions(fixed_user_ids)
+        result.bills += len(fixed)
+        result.bills_checked += len(chunk)
+        if progress is not None:
+            progress(result)
+    return result
@@ -0,0 +1,158 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Background and concurrent execution of reports.
+
+Reports are run on small in-process thread pools. Job state and finished
+output are kept in the Django cache for a bounded time, so any process that
+shares the cache can answer status polls.
+"""
+
+import concurrent.futures
+import copy
+import logging
+import threading
+import time
+import typing
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils import translation
+
+from expenses.reports import Report
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY = "expenses_report_job:{}"
+
+_executors: typing.Dict[str, concurrent.futures.ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+
+
+def jobs_enabled() -> bool:
+    """Check if background report jobs are enabled."""
+    return getattr(settings, "EXPENSES_REPORT_JOBS_ENABLED", False)
+
+
+def get_executor(name: str = "jobs", max_workers: int = 2) -> concurrent.futures.ThreadPoolExecutor:
+    """Get a named report worker pool, creating it on first use."""
+    with _executor_lock:
+        if name not in _executors:
+            _executors[name] = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=f"expenses-report-{name}",
+            )
+        return _executors[name]
+
+
+def get_job(job_id: str) -> typing.Optional[dict]:
+    """Get the state of a job, or None if it does not exist (or has expired)."""
+    return cache.get(JOB_KEY.format(job_id))
+
+
+def _store_job(job: dict) -> None:
+    cache.set(JOB_KEY.format(job["id"]), job, getattr(settings, "EXPENSES_REPORT_JOBS_RESULT_TIMEOUT", 3600))
+
+
+def _update_job(job: dict, **kwargs) -> None:
+    job.update(kwargs)
+    _store_job(job)
+
+
+def detach_report(report: Report) -> Report:
+    """Copy a report, with a new request, to run it on a worker thread.
+
+    The request being served must not be used by other threads, or after its
+    response is sent. The copy gets a plain request with the path, query
+    string, (a copy of) the user and the current language.
+    """
+    original = report.request
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = original.path
+    request.GET = original.GET.copy()
+    request.user = copy.copy(original.user)
+    request.LANGUAGE_CODE = getattr(original, "LANGUAGE_CODE", translation.get_language())
+    detached = copy.copy(report)
+    detached.request = request
+    return detached
+
+
+def submit_report(report: Report, output_format: str, postfields: typing.List[typing.Tuple[str, str]]) -> str:
+    """Enqueue a report and return the ID of its job."""
+    job = {
+        "id": uuid.uuid4().hex,
+        "user_id": report.request.user.pk,
+        "slug": report.slug,
+        "output_format": output_format,
+        "postfields": postfields,
+        "status": "pending",
+        "submitted": time.time(),
+        "time": None,
+        "content": None,
+        "content_type": None,
+        "content_disposition": None,
+    }
+    _store_job(job)
+    executor = get_executor("jobs", getattr(settings, "EXPENSES_REPORT_JOBS_WORKERS", 2))
+    executor.submit(_run_job, job, detach_report(report), translation.get_language())
+    return job["id"]
+
+
+def _run_job(job: dict, report: Report, language: str) -> None:
+    """Run a report job. Executed on a worker thread."""
+    _update_job(job, status="running")
+    try:
+        with translation.override(language):
+            start_time = time.monotonic()
+            if job["output_format"] == "csv":
+                output = report.run_csv()
+            else:
+                output = report.run()
+            end_time = time.monotonic()
+
+        if isinstance(output, HttpResponse):
+            _update_job(
+                job,
+                status="done",
+                time=end_time - start_time,
+                content=output.content,
+                content_type=output["Content-Type"],
+                content_disposition=output.get("Content-Disposition"),
+            )
+        else:
+            _update_job(job, status="done", time=end_time - start_time, content=str(output), content_type="text/html")
+    except Exception:
+        logger.exception("Report job %s (%s) failed", job["id"], job["slug"])
+        _update_job(job, status="failed")
+    finally:
+        # Worker threads get their own connections, which Django would never close otherwise.
+        connections.close_all()
+
+
+def _run_timed(report: Report, language: str) -> typing.Tuple[str, float]:
+    """Run a report and measure its time. Executed on a worker thread."""
+    try:
+        with translation.override(language):
+            start_time = time.monotonic()
+            output = report.run()
+            end_time = time.monotonic()
+        return output, end_time - start_time
+    finally:
+        connections.close_all()
+
+
+def run_concurrently(reports: typing.List[Report]) -> typing.List[typing.Tuple[str, float]]:
+    """Run several reports at once, returning (HTML, time) pairs in input order.
+
+    Every report runs on its own thread with its own database connection.
+    """
+    executor = get_executor("dashboard", getattr(settings, "EXPENSES_REPORT_DASHBOARD_WORKERS", 4))
+    language = translation.get_language()
+    futures = [executor.submit(_run_timed, detach_report(report), language) for report in reports]
+    return [future.result() for future in futures]
@@ -7,6 +7,7 @@
 import abc
 import csv
 import decimal
+import functools
 import itertools
 import urllib.parse
 import operator
@@ -17,7 +18,6 @@ import enum
 import typing
 
 import django.http
-from babel.dates import format_skeleton
 from django.conf import settings
 from django.db import connection
 from django.http.response import HttpResponse
@@ -26,8 +26,10 @@ from django.urls import reverse
 from django.utils.safestring import SafeString
 from django.utils.html import format_html, mark_safe
 from django.utils.translation import gettext_lazy as _
+from expenses import charts
+from expenses.category_registry import CategoryRegistry, get_category_registry
 from expenses.models import Category
-from expenses.utils import format_money, format_number, get_babel_locale, peek, today_date
+from expenses.utils import format_money, format_number, get_babel_locale, parse_babel_locale, peek, today_date
 
 
 class Engine(enum.Enum):
@@ -102,7 +104,12 @@ class CsvFormatter(ReportItemFormatter):
 class HtmlFormatter(ReportItemFormatter):
     """ "Subclass for html items formatting"""
 
+    def __init__(self, category_registry: typing.Optional[CategoryRegistry] = None):
+        self.category_registry = category_registry
+
     def format_category(self, c: Category) -> str:
+        if self.category_registry is not None and c.pk in self.category_registry:
+            return self.category_registry.link(c.pk)
         return c.html_link()
 
     def format_vendor_link(self, vendor: str) -> str:
@@ -127,9 +134,31 @@ class Report(metaclass=abc.ABCMeta):
     def meta_to_dict(cls) -> typing.Dict[str, typing.Any]:
         return {"name": cls.name, "slug": cls.slug, "description": cls.description, "options": cls.options}
 
-    def __init__(self, request, settings):
+    def __init__(
+        self,
+        request,
+        settings,
+        categories: typing.Optional[typing.List[Category]] = None,
+        category_registry: typing.Optional[CategoryRegistry] = None,
+    ):
         self.request = request
         self.settings = settings
+        self._user_categories = categories
+        self._category_registry = category_registry
+
+    @property
+    def user_categories(self) -> typing.List[Category]:
+        """Ordered categories of the current user, queried at most once per report."""
+        if self._user_categories is None:
+            self._user_categories = list(self.category_registry.categories)
+        return self._user_categories
+
+    @property
+    def category_registry(self) -> CategoryRegistry:
+        """Category registry of the current user, with precomputed links."""
+        if self._category_registry is not None:
+            return self._category_registry
+        return get_category_registry(self.request.user)
 
     @abc.abstractmethod
     def run(self) -> typing.Union[str, SafeString]:
@@ -230,8 +259,15 @@ def format_yearmonth(yearmonth: str) -> str:
     """Format a year-month pair as a locale-dependent string."""
     # Querying for yearmonth is easier (especially with sqlite3) and about the same speed,
     # even if we need to apply some more logic Python-side to make it look nice.
+    return _format_yearmonth(yearmonth, get_babel_locale())
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_yearmonth(yearmonth: str, locale_name: str) -> str:
+    from babel.dates import format_skeleton
+
     year, month = map(int, yearmonth.split("-"))
-    return format_skeleton("yMMMM", datetime.date(year, month, 1), locale=get_babel_locale())
+    return format_skeleton("yMMMM", datetime.date(year, month, 1), locale=parse_babel_locale(locale_name))
 
 
 class MonthCategoryBreakdown(SimpleSQLReport):
@@ -288,21 +324,57 @@ class MonthCategoryBreakdown(SimpleSQLReport):
                 CheckOption(_("Month"), "month"),
                 CheckOption(_("Category"), "category"),
             ],
-        )
+        ),
+        OptionGroup(
+            _("Chart"),
+            "chart_box",
+            [CheckOption(_("Show chart"), "show_chart", type="check")],
+            type="check",
+        ),
     ]
 
-    def __init__(self, request, settings: typing.Dict[CheckOption, typing.Any]):
-        super().__init__(request, settings)
+    def __init__(
+        self, request, settings: typing.Dict[CheckOption, typing.Any], categories=None, category_registry=None
+    ):
+        super().__init__(request, settings, categories, category_registry)
         # Only selected options will be in settings
-        if settings:
-            self.query_type = next(iter(settings)).option_id
+        breakdown = [opt for opt in settings if opt in self.options[0]]
+        if breakdown:
+            self.query_type = breakdown[0].option_id
         else:
             raise ValueError("Query type unknown")
 
+    def tabulate(self, results: typing.Iterable, engine: Engine) -> SafeString:
+        results = list(results)
+        table = super().tabulate(results, engine)
+        if not results or not self.settings.get(self.options[1][0]):
+            return table
+        return self.render_chart(results) + table
+
+    def render_chart(self, results: typing.List[tuple]) -> SafeString:
+        """Render query results as a stacked bar chart of months, or a pie chart of categories."""
+        if self.query_type == "month_category":
+            months = []
+            month_positions: typing.Dict[str, int] = {}
+            for yearmonth, _category_id, _value in results:
+                if yearmonth not in month_positions:
+                    month_positions[yearmonth] = len(months)
+                    months.append(format_yearmonth(yearmonth))
+            series = {c.pk: (c.name, [0] * len(months)) for c in self.user_categories}
+            for yearmonth, category_id, value in results:
+                series[category_id][1][month_positions[yearmonth]] = value
+            return charts.render_bar_chart(months, list(series.values()), stacked=True)
+        elif self.query_type == "month":
+            months = [format_yearmonth(yearmonth) for yearmonth, _value in results]
+            return charts.render_bar_chart(months, [(str(_("Total")), [value for _ym, value in results])])
+        else:
+            names = {c.pk: c.name for c in self.user_categories}
+            return charts.render_pie_chart((names[category_id], value) for category_id, value in results)
+
     def get_column_headers(self, engine: Engine, is_html=True) -> (typing.List[str], typing.List[str]):
-        item_formatter = HtmlFormatter() if is_html else CsvFormatter()
+        item_formatter = HtmlFormatter(self.category_registry) if is_html else CsvFormatter()
         if self.query_type == "month_category":
-            user_categories: typing.Iterable[Category] = Category.user_objects(self.request)
+            user_categories: typing.Iterable[Category] = self.user_categories
             names = [_("Month")] + [item_formatter.format_category(c) for c in user_categories] + [_("Total")]
             return names, ["right"] * len(names)
         elif self.query_type == "category":
@@ -311,9 +383,9 @@ class MonthCategoryBreakdown(SimpleSQLReport):
             return ([_("Month"), _("Total")], ["right", "right"])
 
     def preprocess_rows(self, results: typing.Iterable, is_html=True) -> typing.Iterable:
-        item_formatter = HtmlFormatter() if is_html else CsvFormatter()
+        item_formatter = HtmlFormatter(self.category_registry) if is_html else CsvFormatter()
         if self.query_type == "month_category":
-            user_categories: typing.Iterable[Category] = Category.user_objects(self.request)
+            user_categories: typing.Iterable[Category] = self.user_categories
             user_category_ids: typing.Dict[int, int] = {}
             cat_totals: typing.Dict[int, typing.Union[float, decimal.Decimal]] = {}
             for n, cat in enumerate(user_categories, 1):
@@ -344,7 +416,7 @@ class MonthCategoryBreakdown(SimpleSQLReport):
             yield _("Grand Total"), item_formatter.format_money(total)
         else:
             # category
-            user_categories: typing.Dict[int, Category] = {c.pk: c for c in Category.user_objects(self.request)}
+            user_categories: typing.Dict[int, Category] = {c.pk: c for c in self.user_categories}
             total = 0
             for category, value in results:
                 yield (
@@ -381,7 +453,7 @@ class VendorStats(SimpleSQLReport):
     def preprocess_rows(self, results: typing.Iterable, is_html=True) -> typing.Iterable:
         total_count = 0
         total_amount = 0
-        item_formatter = HtmlFormatter() if is_html else CsvFormatter()
+        item_formatter = HtmlFormatter(self.category_registry) if is_html else CsvFormatter()
 
         for vendor, count, amount, avg in results:
             vendor_link = item_formatter.format_vendor_link(vendor)
@@ -434,7 +506,7 @@ class DailySpending(SimpleSQLReport):
         if days["all_days"] == 0:
             return no_results_to_show()
 
-        user_categories: typing.Iterable[Category] = Category.user_objects(self.request)
+        user_categories: typing.Iterable[Category] = self.user_categories
         timescales = [1, 7, 30, 365]
         timescale_names = {
             1: _("Per 1 day"),
@@ -466,7 +538,7 @@ class DailySpending(SimpleSQLReport):
                 {
                     "days": days,
                     "daily_data": daily_data,
-                    "cat_links": [cat.html_link() for cat in user_categories],
+                    "cat_links": [self.category_registry.link(cat.pk) for cat in user_categories],
                     "cat_tables": cat_tables,
                 },
                 self.request,
@@ -0,0 +1,79 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Scheduled templates.
+
+A template with a schedule adds an expense on every due date, for recurring
+expenses like rent or subscriptions. Templates store their next due date, so
+that all due templates are found with one indexed query. Due expenses are
+added by ``python manage.py expenses_run_schedules``, which should be run
+periodically (eg. daily from cron). Missed dates are caught up on the next
+run, and running it twice on the same day adds nothing.
+"""
+
+import calendar
+import datetime
+import typing
+
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+from expenses.caching import batch_data_version_bumps, bump_data_versions
+
+SCHEDULE_CHOICES = (
+    ("", _("None")),
+    ("monthly", _("Monthly")),
+    ("weekly", _("Weekly")),
+)
+# Template types that can be run without user input.
+SCHEDULED_TYPES = ("simple", "count")
+
+
+def _day_of_month(year: int, month: int, day: int) -> datetime.date:
+    """Get a day of a month, or the last day of the month if it is shorter."""
+    return datetime.date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(schedule: str, day: int, after: datetime.date) -> datetime.date:
+    """Get the first date after a date on which a schedule is due.
+
+    Monthly schedules are due on a day of the month (1–31, the last day in
+    shorter months), weekly schedules on a day of the week (1–7, Monday is 1).
+    """
+    if schedule == "weekly":
+        return after + datetime.timedelta(days=(day - after.isoweekday() - 1) % 7 + 1)
+    elif schedule == "monthly":
+        candidate = _day_of_month(after.year, after.month, day)
+        if candidate <= after:
+            year, month = divmod(after.year * 12 + after.month, 12)
+            candidate = _day_of_month(year, month + 1, day)
+        return candidate
+    raise ValueError(f"Unknown schedule {schedule!r}")
+
+
+def materialize_due_templates(today: typing.Optional[datetime.date] = None) -> int:
+    """Add the expenses of all scheduled templates due by today. Returns the number of expenses added."""
+    from expenses.models import Expense, ExpenseTemplate
+    from expenses.utils import today_date
+
+    if today is None:
+        today = today_date()
+    with transaction.atomic():
+        templates = list(
+            ExpenseTemplate.objects.select_for_update().filter(schedule_next_date__lte=today, type__in=SCHEDULED_TYPES)
+        )
+        expenses = []
+        for template in templates:
+            date = template.schedule_next_date
+            while date <= today:
+                expenses.append(template.scheduled_expense(date))
+                template.schedule_last_date = date
+                date = next_occurrence(template.schedule, template.schedule_day, date)
+            template.schedule_next_date = date
+        with batch_data_version_bumps():
+            Expense.objects.bulk_create(expenses)
+            ExpenseTemplate.objects.bulk_update(templates, ["schedule_last_date", "schedule_next_date"])
+            bump_data_versions(template.user_id for template in templates)
+    return len(expenses)
@@ -0,0 +1,119 @@
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
+
+"""Template run plans.
+
+A run plan is a template description parsed for its template type: plural
+forms, description choices and menu amounts. Plans are memoized by type and
+description, so running, rendering and listing templates does not re-parse
+descriptions. Menu items without a valid amount are listed in the plan, so
+that they are reported when the template is saved.
+"""
+
+import decimal
+import functools
+import typing
+
+import attr
+
+from expenses.utils import parse_amount_input, round_money
+
+
+class RunError(ValueError):
+    """Raised when the parameters of a template run are invalid."""
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class RunPlan:
+    type: str
+    # The description, or the main description line of desc_select templates
+    description: str
+    # Plural forms of count templates
+    forms: typing.Tuple[str, ...] = ()
+    # Choices shown to the user (desc_select and menu templates)
+    choices: typing.Tuple[str, ...] = ()
+    # Descriptions and amounts of menu items
+    menu: typing.Tuple[typing.Tuple[str, typing.Optional[decimal.Decimal]], ...] = ()
+    # Numbers (1-based) of menu lines without a valid amount
+    invalid_lines: typing.Tuple[int, ...] = ()
+
+    def _plural_form(self, count: decimal.Decimal) -> str:
+        forms = self.forms
+        if count % 1 != 0:
+            # Is decimal, use last possibility
+            return forms[-1]
+        elif len(forms) == 2:
+            # 0 → 1, 1 → anything else (English)
+            return forms[int(count != 1)]
+        elif len(forms) in {3, 4}:
+            # Polish scheme
+            if count == 1:
+                return forms[0]
+            # Expression from gettext, simplified
+            return forms[1 if (2 <= count % 10 <= 4 and (count % 100 < 10 or count % 100 >= 20)) else 2]
+        return forms[0]
+
+    def _choice(self, params: typing.Mapping[str, str]) -> int:
+        try:
+            choice = int(params["desc_id"])
+        except (KeyError, TypeError, ValueError):
+            raise RunError("Invalid choice")
+        if not 0 <= choice < len(self.choices):
+            raise RunError("Invalid choice")
+        return choice
+
+    def run(
+        self, amount: typing.Optional[decimal.Decimal], params: typing.Mapping[str, str]
+    ) -> typing.Tuple[decimal.Decimal, str]:
+        """Get the amount and description of an expense, given the template amount and run parameters.
+
+        Raises RunError if the parameters are invalid.
+        """
+        if self.type == "count":
+            if not params.get("count"):
+                count = decimal.Decimal(1)
+            else:
+                count = parse_amount_input(params["count"])
+                if count is None or not count.is_finite():
+                    raise RunError("Invalid count")
+            return round_money(amount * count), self._plural_form(count).replace("!count!", str(count))
+        elif self.type == "description":
+            if "description" not in params:
+                raise RunError("Missing description")
+            return amount, self.description.replace("!description!", params["description"])
+        elif self.type == "desc_select":
+            return amount, self.description.replace("!description!", self.choices[self._choice(params)])
+        elif self.type == "menu":
+            description, menu_amount = self.menu[self._choice(params)]
+            if menu_amount is None:
+                raise RunError("Invalid menu amount")
+            return menu_amount, description
+        return amount, self.description
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_run_plan(template_type: str, description: str) -> RunPlan:
+    """Parse a template description into a run plan."""
+    if template_type == "count":
+        forms = tuple(line.strip() for line in description.strip().split("\n"))
+        return RunPlan(template_type, description, forms=forms)
+    elif template_type == "desc_select":
+        main, *choices = (line.strip() for line in description.strip().split("\n"))
+        return RunPlan(template_type, main, choices=tuple(choices))
+    elif template_type == "menu":
+        choices = tuple(line.strip() for line in description.strip().split("\n"))
+        menu = []
+        invalid_lines = []
+        for number, line in enumerate(choices, 1):
+            amount_str, _sep, item_description = line.partition(" ")
+            amount = parse_amount_input(amount_str)
+            if amount is None or not amount.is_finite():
+                amount = None
+                invalid_lines.append(number)
+            menu.append((item_description.strip(), amount))
+        return RunPlan(
+            template_type, description, choices=choices, menu=tuple(menu), invalid_lines=tuple(invalid_lines)
+        )
+    return RunPlan(template_type, description)
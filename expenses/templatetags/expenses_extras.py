@@ -1,12 +1,20 @@
+import hashlib
 import json
 import decimal
+import typing
 
 from django import template
 from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
 from django.utils import formats
 from django.utils.html import mark_safe
+from django.utils.safestring import SafeString
+from django.utils.translation import get_language
 from django.urls import reverse
 
+from expenses.caching import DEFAULT_TIMEOUT, versioned_key
+from expenses.category_registry import get_category_link, get_category_registry
 from expenses.pagination import pagination
 from expenses.utils import format_money, today_date
 
@@ -28,12 +36,72 @@ def exp_config_json():
 
 
 @register.simple_tag(takes_context=True)
-def exp_set_page(context, page):
+def exp_set_page(context, page, cursor=None):
     get = context["request"].GET.copy()
     get["page"] = page
+    if cursor:
+        get["cursor"] = cursor
+    else:
+        get.pop("cursor", None)
     return "?" + get.urlencode()
 
 
+@register.simple_tag(takes_context=True)
+def exp_category_link(context, category_id):
+    return get_category_link(context.request.user, category_id)
+
+
+def render_expense_rows(expenses, user, show_bill_badge: bool) -> typing.Tuple[SafeString, SafeString]:
+    """Render the desktop rows and the mobile table of an expense table.
+
+    Both are cached for the page (until the user’s data changes), and every
+    row is cached on its own (until the expense or the user’s categories
+    change), so that a page with one new expense reuses the other rows.
+    """
+    expenses = list(expenses)
+    use_cache = getattr(settings, "EXPENSES_FRAGMENT_CACHE", True)
+    timeout = getattr(settings, "EXPENSES_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+    language = get_language()
+    badge = int(show_bill_badge)
+
+    if use_cache:
+        page = hashlib.md5(",".join(str(e.pk) for e in expenses).encode("ascii")).hexdigest()
+        table_key = versioned_key("expenses_table", user.pk, language, badge, page)
+        cached = cache.get(table_key)
+        if cached is not None:
+            return cached
+
+    registry = get_category_registry(user)
+    row_keys = {
+        e.pk: f"expenses_table_row:{e.pk}:{e.date_modified.timestamp()}:{language}:{badge}:{registry.token}"
+        for e in expenses
+    }
+    rows = cache.get_many(list(row_keys.values())) if use_cache else {}
+    missing = {}
+    row_template = get_template("expenses/extras/expense_table_row.html")
+    mobile_row_template = get_template("expenses/extras/expense_table_mobile_row.html")
+    for expense in expenses:
+        key = row_keys[expense.pk]
+        if key not in rows:
+            ctx = {
+                "expense": expense,
+                "category_link": get_category_link(user, expense.category_id),
+                "show_bill_badge": show_bill_badge,
+            }
+            rows[key] = missing[key] = (row_template.render(ctx), mobile_row_template.render(ctx))
+    if use_cache and missing:
+        cache.set_many(missing, timeout)
+
+    desktop_rows = mark_safe("".join(rows[row_keys[e.pk]][0] for e in expenses))
+    mobile_table = get_template("expenses/extras/expense_table_mobile.html").render(
+        {"rows": [(e, mark_safe(rows[row_keys[e.pk]][1])) for e in expenses]}
+    )
+    result = desktop_rows, mark_safe(mobile_table)
+    if use_cache:
+        cache.set(table_key, result, timeout)
+    return result
+
+
 @register.inclusion_tag("expenses/extras/expense_table.html", takes_context=True)
 def expense_table(context, expenses):
     show_form = context.get("show_form", False)
@@ -41,6 +109,10 @@ def expense_table(context, expenses):
     if show_form:
         ctx["categories"] = context.get("categories", None)
         ctx["today"] = today_date()
+    if expenses:
+        ctx["desktop_rows"], ctx["mobile_table"] = render_expense_rows(
+            expenses, context.request.user, context["pid"] != "bill_list"
+        )
     return ctx
 
 
@@ -51,7 +123,8 @@ def template_table(templates):
 
 @register.inclusion_tag("expenses/extras/exp_paginator.html", takes_context=True)
 def exp_paginator(context, page):
-    page_range = pagination(page.number, page.paginator.num_pages)
+    paginator = page.paginator
+    page_range = pagination(page.number, paginator.num_pages, getattr(paginator, "approximate", False))
     return {"page": page, "page_range": page_range, "request": context["request"]}
 
 
@@ -1,3 +1,690 @@
-from django.test import TestCase
+# Django-Expenses
+# Copyright © 2018-2023, Chris Warrick.
+# All rights reserved.
+# See /LICENSE for licensing information.
 
-# Create your tests here.
+import concurrent.futures
+import datetime
+import decimal
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import connection
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from expenses import caching, report_jobs
+
+from expenses.backup import RestoreError, export_archive, restore_archive
+from expenses.deletion_records import compact_deletion_records, get_cutoff
+from expenses.imports import import_expenses
+from expenses.keyset import EXPENSE_ORDERING, KeysetPaginator, encode_cursor
+from expenses.models import BillItem, Category, DataVersion, DeletionRecord, Expense, ExpenseTemplate, ImportMapping
+from expenses.purge import purge_user_data
+from expenses.query_plans import SUPPORTED_VENDORS, check_query_plans
+from expenses.rebuild import rebuild_derived_fields
+from expenses.schedules import materialize_due_templates
+from expenses.template_plans import RunError, compile_run_plan
+from expenses.utils import parse_amount_input
+from expenses.views import conditional_page
+from expenses.views.category import category_bulk_edit
+
+
+class ImportTimeTests(SimpleTestCase):
+    # Imported on first use; the timing itself is measured by expenses_check_imports.
+    HEAVY_MODULES = ["expenses.reports", "babel", "pygal", "numpy"]
+
+    def test_urls_import_is_light(self):
+        # Imported in a fresh interpreter, with the current settings.
+        code = (
+            "import json, sys; import django; django.setup(); import expenses.urls; "
+            f"print(json.dumps([m for m in {self.HEAVY_MODULES!r} if m in sys.modules]))"
+        )
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+        process = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(json.loads(process.stdout), [])
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="keyset")
+        category = Category.objects.create(user=cls.user, name="Food", order=1)
+        for day in range(1, 6):
+            Expense.objects.create(
+                user=cls.user, date=datetime.date(2023, 1, day), vendor="Shop", category=category, amount=1
+            )
+
+    def get_paginator(self):
+        return KeysetPaginator(Expense.objects.filter(user=self.user), EXPENSE_ORDERING, 2, self.user.pk, "test")
+
+    def get_page(self, cursor):
+        return self.get_paginator().get_page(2, cursor)
+
+    def test_seek(self):
+        paginator = self.get_paginator()
+        middle = Expense.objects.get(user=self.user, date=datetime.date(2023, 1, 3))
+        values = paginator.key_values(middle)
+        self.assertEqual([e.date.day for e in paginator.seek(values)], [2, 1])
+        self.assertEqual([e.date.day for e in paginator.seek(values, forward=False)], [4, 5])
+
+    def test_cursor(self):
+        first = Expense.objects.filter(user=self.user).order_by(*EXPENSE_ORDERING)[1]
+        page = self.get_page(encode_cursor(True, [first.date, first.date_added, first.pk]))
+        self.assertEqual([e.date.day for e in page], [3, 2])
+
+    def test_invalid_cursor(self):
+        for values in (["notadate", "x", 1], [{"a": 1}, "x", 1], [None, None, None], ["2023-01-01", "x", 1], [1]):
+            with self.subTest(values=values):
+                # Falls back to the page number
+                page = self.get_page(encode_cursor(True, values))
+                self.assertEqual([e.date.day for e in page], [3, 2])
+
+
+@unittest.skipUnless(connection.vendor in SUPPORTED_VENDORS, "Query plans are checked on SQLite and PostgreSQL")
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        user = get_user_model().objects.create(username="plans")
+        category = Category.objects.create(user=user, name="Food", order=1)
+        Expense.objects.create(user=user, date=datetime.date(2023, 1, 1), vendor="Shop", category=category, amount=1)
+        for name, (used, index, plan) in check_query_plans(user.pk).items():
+            with self.subTest(query=name):
+                self.assertTrue(used, f"{name} does not use {index}:\n{plan}")
+
+
+class ConditionalPageTests(TestCase):
+    def test_etag_only_for_get(self):
+        user = get_user_model().objects.create(username="conditional")
+        methods = []
+
+        @conditional_page
+        def view(request):
+            methods.append(request.method)
+            return HttpResponse("ok")
+
+        def request(method, **extra):
+            request = getattr(RequestFactory(), method)("/", **extra)
+            request.user = user
+            request.session = SessionBase()
+            return request
+
+        etag = view(request("get"))["ETag"]
+        self.assertEqual(view(request("get", HTTP_IF_NONE_MATCH=etag)).status_code, 304)
+        response = view(request("post", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(methods, ["GET", "POST"])
+
+
+class CategoryBulkEditTests(TestCase):
+    names = ["Food", "Drinks", "Home", "Other"]
+
+    def create_user(self, username):
+        user = get_user_model().objects.create(username=username)
+        for order, name in enumerate(self.names, 1):
+            Category.objects.create(user=user, name=name, order=order)
+        return user
+
+    def test_bulk_edit(self):
+        # Saves the categories one by one, as the view did before it used bulk queries
+        old_user = self.create_user("old")
+        old = {c.name: c for c in Category.objects.filter(user=old_user)}
+        old["Drinks"].name = "Food"
+        old["Drinks"].save()
+        old["Home"].order = 5
+        old["Home"].save()
+        Category.objects.create(user=old_user, name="Food", order=6)
+        Category.objects.create(user=old_user, name="Garden", order=7)
+
+        user = self.create_user("new")
+        categories = {c.name: c for c in Category.objects.filter(user=user)}
+        data = {
+            "add_1_name": "Food",
+            "add_1_order": "6",
+            "add_2_name": "Garden",
+            "add_2_order": "7",
+            "add_3_name": "Invalid",
+            "add_3_order": "x",
+        }
+        for name, new_name, order in [
+            ("Food", "Food", 1),
+            ("Drinks", "Food", 2),
+            ("Home", "Home", 5),
+            ("Other", "", 4),
+        ]:
+            data[f"cat_{categories[name].pk}_name"] = new_name
+            data[f"cat_{categories[name].pk}_order"] = str(order)
+        request = RequestFactory().post("/", data)
+        request.user = user
+
+        with mock.patch("expenses.views.category.render", return_value=HttpResponse()) as render:
+            # Categories, bulk update, bulk insert, one data version bump, and the transaction
+            # savepoint and release; the same for any number of categories.
+            with self.assertNumQueries(6):
+                category_bulk_edit(request)
+        context = render.call_args[0][2]
+        self.assertEqual(
+            (context["added_count"], context["changed_count"], context["unchanged_count"], context["failure_count"]),
+            (2, 2, 1, 2),
+        )
+
+        def slugs(user):
+            return list(Category.objects.filter(user=user).order_by("order", "pk").values_list("name", "slug", "order"))
+
+        self.assertEqual(slugs(user), slugs(old_user))
+        self.assertEqual(
+            slugs(user),
+            [
+                ("Food", "food", 1),
+                ("Food", "food-1", 2),
+                ("Other", "other", 4),
+                ("Home", "home", 5),
+                ("Food", "food-2", 6),
+                ("Garden", "garden", 7),
+            ],
+        )
+
+
+class SynchronousExecutor(concurrent.futures.Executor):
+    """Runs submitted functions immediately, on the calling thread."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+class ReportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="reports")
+        cls.food = Category.objects.create(user=cls.user, name="Food", order=1)
+        cls.transport = Category.objects.create(user=cls.user, name="Transport", order=2)
+        for day, category, vendor, amount in [
+            (1, cls.food, "Bakery", "2.50"),
+            (2, cls.food, "Grocer", "10.00"),
+            (2, cls.transport, "Railway", "7.35"),
+            (20, cls.food, "Bakery", "3.15"),
+        ]:
+            Expense.objects.create(
+                user=cls.user, date=datetime.date(2023, 2, day), vendor=vendor, category=category, amount=amount
+            )
+
+    def request(self, method="get", data=None):
+        request = getattr(RequestFactory(), method)("/", data or {})
+        request.user = self.user
+        return request
+
+    def run_in_workers(self):
+        """Run report pools synchronously. Returns a mock of connections, to check they are closed."""
+        patcher = mock.patch("expenses.report_jobs.get_executor", return_value=SynchronousExecutor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Worker threads close their connections, which would end the test transaction here.
+        patcher = mock.patch("expenses.report_jobs.connections")
+        connections = patcher.start()
+        self.addCleanup(patcher.stop)
+        return connections
+
+
+@override_settings(EXPENSES_REPORT_JOBS_ENABLED=True, EXPENSES_REPORT_JOBS_RESULT_TIMEOUT=120)
+class ReportJobTests(ReportTestCase):
+    def test_background_job(self):
+        from expenses.views.reports import report_job, report_job_download, report_run
+
+        connections = self.run_in_workers()
+        for output_format in ("html", "csv"):
+            with self.subTest(output_format=output_format):
+                data = {"breakdown": "category", "output_format": output_format, "run_in_background": "on"}
+                with mock.patch.object(report_jobs.cache, "set", wraps=report_jobs.cache.set) as cache_set:
+                    response = report_run(self.request("post", data), "month_category_breakdown")
+                self.assertEqual(response.status_code, 302)
+                job_id = response.url.rstrip("/").split("/")[-1]
+                job_key = report_jobs.JOB_KEY.format(job_id)
+                job_timeouts = {call.args[2] for call in cache_set.call_args_list if call.args[0] == job_key}
+                self.assertEqual(job_timeouts, {120})
+
+                job = report_jobs.get_job(job_id)
+                self.assertEqual(job["status"], "done")
+                download = report_job_download(self.request(), job_id)
+                self.assertEqual(download.status_code, 200)
+                self.assertIn("Transport", download.content.decode("utf-8"))
+                if output_format == "csv":
+                    self.assertIn("attachment", download["Content-Disposition"])
+                else:
+                    with mock.patch("expenses.views.reports.render", return_value=HttpResponse()) as render:
+                        report_job(self.request(), job_id)
+                    self.assertIn("Transport", render.call_args[0][2]["report_html"])
+        self.assertEqual(connections.close_all.call_count, 2)
+
+    def test_job_of_other_user(self):
+        from django.http import Http404
+
+        from expenses.views.reports import report_job
+
+        self.run_in_workers()
+        job_id = report_jobs.submit_report(self.build_report(), "html", [])
+        request = RequestFactory().get("/")
+        request.user = get_user_model().objects.create(username="other")
+        with self.assertRaises(Http404):
+            report_job(request, job_id)
+
+    def build_report(self):
+        from expenses.reports import AVAILABLE_REPORTS
+        from expenses.views.reports import build_report
+
+        return build_report(AVAILABLE_REPORTS["month_category_breakdown"], self.request(), {"breakdown": "month"})
+
+
+@override_settings(
+    EXPENSES_REPORT_DASHBOARDS={
+        "review": {
+            "name": "Review",
+            "reports": [("month_category_breakdown", {"breakdown": "category"}), ("vendor_stats", {})],
+        }
+    }
+)
+class ReportDashboardTests(ReportTestCase):
+    def test_dashboard(self):
+        from expenses.views.reports import report_dashboard
+
+        connections = self.run_in_workers()
+        with mock.patch("expenses.views.reports.render", return_value=HttpResponse()) as render:
+            report_dashboard(self.request(), "review")
+        breakdown, vendors = render.call_args[0][2]["results"]
+        self.assertEqual(breakdown["report"].slug, "month_category_breakdown")
+        self.assertIn("Food", breakdown["report_html"])
+        self.assertIn("Transport", breakdown["report_html"])
+        self.assertEqual(vendors["report"].slug, "vendor_stats")
+        # Vendor stats only list repeated vendors.
+        self.assertIn("Bakery", vendors["report_html"])
+        self.assertNotIn("Railway", vendors["report_html"])
+        # Every worker closes its database connections.
+        self.assertEqual(connections.close_all.call_count, 2)
+
+    def test_unknown_dashboard(self):
+        from expenses.views.reports import report_dashboard
+
+        self.assertEqual(report_dashboard(self.request(), "nope").status_code, 404)
+
+
+class AmountInputTests(SimpleTestCase):
+    def test_parse_amount_input(self):
+        self.assertEqual(parse_amount_input("1.50"), decimal.Decimal("1.50"))
+        self.assertEqual(parse_amount_input("1,50"), decimal.Decimal("1.50"))
+        # Text that is not a number is rejected, not raised as decimal.InvalidOperation.
+        self.assertIsNone(parse_amount_input("abc"))
+        self.assertIsNone(parse_amount_input("1,5,0"))
+
+    def test_invalid_run_parameters(self):
+        count_plan = compile_run_plan("count", "!count! bun\n!count! buns")
+        self.assertEqual(count_plan.run(decimal.Decimal("2.00"), {"count": "3"}), (decimal.Decimal("6.00"), "3 buns"))
+        with self.assertRaises(RunError):
+            count_plan.run(decimal.Decimal("2.00"), {"count": "three"})
+
+        menu_plan = compile_run_plan("menu", "5.00 Soup\nfree Bread")
+        self.assertEqual(menu_plan.invalid_lines, (2,))
+        self.assertEqual(menu_plan.run(None, {"desc_id": "0"}), (decimal.Decimal("5.00"), "Soup"))
+        with self.assertRaises(RunError):
+            menu_plan.run(None, {"desc_id": "1"})
+
+
+class DataVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="versions")
+        cls.category = Category.objects.create(user=cls.user, name="Food", order=1)
+
+    def count_bumps(self, queries) -> int:
+        return sum(1 for q in queries if q["sql"].startswith('UPDATE "expenses_dataversion"'))
+
+    def test_cascade_bumps_once(self):
+        bill = Expense.objects.create(
+            user=self.user, date=datetime.date(2023, 1, 1), vendor="Shop", category=self.category, is_bill=True
+        )
+        for product in ("Bread", "Milk", "Eggs"):
+            BillItem.objects.create(user=self.user, bill=bill, product=product, serving=1, count=1, unit_price=1)
+        caching.get_data_version(self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            bill.delete()
+        self.assertEqual(self.count_bumps(queries), 1)
+
+    def test_batch(self):
+        with CaptureQueriesContext(connection) as queries, caching.batch_data_version_bumps():
+            for day in range(1, 4):
+                Expense.objects.create(
+                    user=self.user, date=datetime.date(2023, 1, day), vendor="Shop", category=self.category, amount=1
+                )
+            self.assertEqual(self.count_bumps(queries), 0)
+        self.assertEqual(self.count_bumps(queries), 1)
+
+
+class DataVersionCacheTests(TransactionTestCase):
+    # Not in a test transaction: versions bumped in one are always read from the database.
+    def test_bump_during_load(self):
+        user = get_user_model().objects.create(username="versions")
+        key = caching.DATA_VERSION_KEY.format(user.pk)
+        cache.delete(key)
+        # Another request bumps the version (and clears the key) after it is loaded, but before it is cached.
+        with mock.patch("expenses.caching._load_data_version", side_effect=[1, 2]):
+            self.assertEqual(caching.get_data_version(user.pk), 2)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(caching.get_data_version(user.pk), DataVersion.objects.get(user=user).version)
+        self.assertEqual(cache.get(key), DataVersion.objects.get(user=user).version)
+
+
+class CategoryMergeTests(TestCase):
+    def test_merge(self):
+        user = get_user_model().objects.create(username="merge")
+        source = Category.objects.create(user=user, name="Snacks", order=1)
+        dest = Category.objects.create(user=user, name="Food", order=2)
+        expense = Expense.objects.create(
+            user=user, date=datetime.date(2023, 1, 1), vendor="Shop", category=source, amount=1
+        )
+        template = ExpenseTemplate.objects.create(
+            user=user, name="Crisps", vendor="Shop", category=source, amount=2, description="Crisps"
+        )
+        source_pk = source.pk
+        old_modified = expense.date_modified
+
+        self.assertTrue(source.merge_into(dest.pk))
+        self.assertFalse(Category.objects.filter(pk=source_pk).exists())
+        expense.refresh_from_db()
+        template.refresh_from_db()
+        self.assertEqual(expense.category, dest)
+        self.assertEqual(template.category, dest)
+        self.assertGreater(expense.date_modified, old_modified)
+        self.assertTrue(DeletionRecord.objects.filter(user=user, model="category", object_pk=source_pk).exists())
+
+    def test_merge_into_other_user(self):
+        user = get_user_model().objects.create(username="merge")
+        other = get_user_model().objects.create(username="other")
+        source = Category.objects.create(user=user, name="Snacks", order=1)
+        foreign = Category.objects.create(user=other, name="Food", order=1)
+        Expense.objects.create(user=user, date=datetime.date(2023, 1, 1), vendor="Shop", category=source, amount=1)
+
+        self.assertFalse(source.merge_into(foreign.pk))
+        self.assertTrue(Category.objects.filter(pk=source.pk).exists())
+        self.assertFalse(DeletionRecord.objects.filter(user=user).exists())
+
+
+class ScheduleTests(TestCase):
+    def test_run_twice(self):
+        user = get_user_model().objects.create(username="schedules")
+        category = Category.objects.create(user=user, name="Home", order=1)
+        template_args = {"user": user, "vendor": "Landlord", "category": category, "amount": 100}
+        monthly = ExpenseTemplate.objects.create(
+            name="Rent",
+            description="Rent",
+            schedule="monthly",
+            schedule_day=15,
+            schedule_last_date=datetime.date(2023, 1, 15),
+            **template_args,
+        )
+        # Wednesdays
+        weekly = ExpenseTemplate.objects.create(
+            name="Cleaning",
+            description="Cleaning",
+            schedule="weekly",
+            schedule_day=3,
+            schedule_last_date=datetime.date(2023, 2, 1),
+            **template_args,
+        )
+        self.assertEqual(monthly.schedule_next_date, datetime.date(2023, 2, 15))
+        self.assertEqual(weekly.schedule_next_date, datetime.date(2023, 2, 8))
+
+        today = datetime.date(2023, 2, 15)
+        self.assertEqual(materialize_due_templates(today), 3)
+        self.assertEqual(materialize_due_templates(today), 0)
+
+        dates = Expense.objects.filter(user=user).order_by("date", "description").values_list("description", "date")
+        self.assertEqual(
+            list(dates),
+            [
+                ("Cleaning", datetime.date(2023, 2, 8)),
+                ("Cleaning", datetime.date(2023, 2, 15)),
+                ("Rent", datetime.date(2023, 2, 15)),
+            ],
+        )
+        monthly.refresh_from_db()
+        weekly.refresh_from_db()
+        self.assertEqual((monthly.schedule_last_date, monthly.schedule_next_date), (today, datetime.date(2023, 3, 15)))
+        self.assertEqual((weekly.schedule_last_date, weekly.schedule_next_date), (today, datetime.date(2023, 2, 22)))
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="imports")
+        cls.category = Category.objects.create(user=cls.user, name="Food", order=1)
+
+    def import_rows(self, rows):
+        lines = ["Date,Vendor,Amount,Description,Category"]
+        lines += [f"{date},{vendor},{amount},,Food" for date, vendor, amount in rows]
+        data = io.BytesIO("\n".join(lines).encode("utf-8"))
+        return import_expenses(self.user, data, ImportMapping(user=self.user), chunk_size=2)
+
+    def test_duplicate_across_chunks(self):
+        Expense.objects.create(
+            user=self.user, date=datetime.date(2023, 1, 1), vendor="Shop", category=self.category, amount=5
+        )
+        # The repeated row is in the second chunk; only one of the two matches the existing expense.
+        rows = [("2023-01-01", "Shop", "5.00"), ("2023-01-02", "Bar", "1.00"), ("2023-01-01", "Shop", "5.00")]
+        result = self.import_rows(rows)
+        self.assertEqual((result.imported, result.duplicates), (2, 1))
+        self.assertEqual(Expense.objects.filter(user=self.user, vendor="Shop").count(), 2)
+
+    def test_import_twice(self):
+        rows = [("2023-01-01", "Shop", "5.00"), ("2023-01-01", "Shop", "5.00"), ("2023-01-02", "Bar", "1.00")]
+        result = self.import_rows(rows)
+        self.assertEqual((result.imported, result.duplicates), (3, 0))
+        result = self.import_rows(rows)
+        self.assertEqual((result.imported, result.duplicates), (0, 3))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
+
+
+@unittest.skipUnless(connection.features.can_return_rows_from_bulk_insert, "Restoring needs IDs from bulk inserts")
+class BackupTests(TestCase):
+    def snapshot(self, user) -> dict:
+        """The data of a user, without IDs."""
+        return {
+            "categories": list(
+                Category.objects.filter(user=user).order_by("order").values_list("name", "slug", "order")
+            ),
+            "expenses": list(
+                Expense.objects.filter(user=user)
+                .order_by("date", "vendor")
+                .values_list("date", "vendor", "category__name", "amount", "description", "is_bill", "date_added")
+            ),
+            "bill_items": list(
+                BillItem.objects.filter(user=user)
+                .order_by("bill__date", "product")
+                .values_list("bill__vendor", "product", "serving", "count", "unit_price", "date_modified")
+            ),
+            "templates": list(
+                ExpenseTemplate.objects.filter(user=user).values_list("name", "category__name", "amount", "description")
+            ),
+        }
+
+    def test_round_trip(self):
+        source = get_user_model().objects.create(username="source")
+        food = Category.objects.create(user=source, name="Food", order=1)
+        home = Category.objects.create(user=source, name="Home", order=2)
+        Expense.objects.create(
+            user=source, date=datetime.date(2023, 1, 1), vendor="Bakery", category=food, amount=3, description="Bun"
+        )
+        bill = Expense.objects.create(
+            user=source, date=datetime.date(2023, 1, 2), vendor="Grocer", category=food, is_bill=True
+        )
+        BillItem.objects.create(user=source, bill=bill, product="Milk", serving=1000, count=2, unit_price="1.99")
+        BillItem.objects.create(user=source, bill=bill, product="Eggs", serving=None, count=1, unit_price="4.50")
+        ExpenseTemplate.objects.create(user=source, name="Rent", vendor="Landlord", category=home, description="Rent")
+        archive = io.BytesIO(b"".join(export_archive(source, chunk_size=1)))
+
+        target = get_user_model().objects.create(username="target")
+        counts = restore_archive(target, archive, chunk_size=1)
+        self.assertEqual(counts, {"category": 2, "expense": 2, "billitem": 2, "expensetemplate": 1})
+        expected = self.snapshot(source)
+        self.assertEqual(expected["bill_items"][0][1:5], ("Eggs", None, decimal.Decimal(1), decimal.Decimal("4.50")))
+        self.assertEqual(self.snapshot(target), expected)
+
+        # Only empty accounts can be restored into.
+        archive.seek(0)
+        with self.assertRaises(RestoreError):
+            restore_archive(target, archive)
+
+
+class RebuildTests(TestCase):
+    def test_rebuild(self):
+        user = get_user_model().objects.create(username="rebuild")
+        category = Category.objects.create(user=user, name="Food", order=1)
+        plain = Expense.objects.create(
+            user=user, date=datetime.date(2023, 1, 1), vendor="Bakery", category=category, amount=3, description="Bun"
+        )
+        bills = []
+        for day, products in enumerate([["Milk"], ["Eggs", "Tea"], ["Rice"]], 2):
+            bill = Expense.objects.create(
+                user=user, date=datetime.date(2023, 1, day), vendor="Grocer", category=category, is_bill=True
+            )
+            for product in products:
+                BillItem.objects.create(user=user, bill=bill, product=product, serving=1, count=2, unit_price="1.25")
+            bills.append(bill)
+        # Direct database edits, which skip the signals that keep the fields up to date
+        Expense.objects.filter(pk=plain.pk).update(description_cache="stale")
+        Expense.objects.filter(pk__in=[bills[0].pk, bills[1].pk]).update(amount=0, description_cache="")
+        expenses = Expense.objects.filter(user=user)
+        version = caching.get_data_version(user.pk)
+
+        result = rebuild_derived_fields(expenses, dry_run=True, chunk_size=2)
+        self.assertEqual((result.descriptions, result.bills, result.bills_checked), (1, 2, 3))
+        self.assertEqual(Expense.objects.get(pk=plain.pk).description_cache, "stale")
+
+        result = rebuild_derived_fields(expenses, chunk_size=2)
+        self.assertEqual((result.descriptions, result.bills, result.bills_checked), (1, 2, 3))
+        self.assertEqual(
+            list(expenses.order_by("date").values_list("amount", "description_cache")),
+            [
+                (decimal.Decimal("3.00"), "Bun"),
+                (decimal.Decimal("2.50"), "Milk"),
+                (decimal.Decimal("5.00"), "Eggs, Tea"),
+                (decimal.Decimal("2.50"), "Rice"),
+            ],
+        )
+        self.assertNotEqual(caching.get_data_version(user.pk), version)
+
+        result = rebuild_derived_fields(expenses, chunk_size=2)
+        self.assertEqual((result.descriptions, result.bills), (0, 0))
+
+
+class PurgeTests(TestCase):
+    def create_data(self, username):
+        user = get_user_model().objects.create(username=username)
+        category = Category.objects.create(user=user, name="Food", order=1)
+        Expense.objects.create(user=user, date=datetime.date(2023, 1, 1), vendor="Bakery", category=category, amount=3)
+        bill = Expense.objects.create(
+            user=user, date=datetime.date(2023, 1, 2), vendor="Grocer", category=category, is_bill=True
+        )
+        for product in ("Milk", "Eggs", "Tea"):
+            BillItem.objects.create(user=user, bill=bill, product=product, serving=1, count=1, unit_price=1)
+        ExpenseTemplate.objects.create(user=user, name="Bun", vendor="Bakery", category=category, description="Bun")
+        ImportMapping.objects.create(user=user, default_category=category)
+        return user
+
+    def setUp(self):
+        self.other = self.create_data("other")
+        self.other_counts = self.counts(self.other.pk)
+
+    def counts(self, user_id) -> dict:
+        return {
+            model.__name__: model.objects.filter(user_id=user_id).count()
+            for model in (Category, Expense, BillItem, ExpenseTemplate, ImportMapping, DeletionRecord, DataVersion)
+        }
+
+    def test_purge_data(self):
+        user = self.create_data("purge")
+        version = caching.get_data_version(user.pk)
+        counts = purge_user_data(user, chunk_size=2)
+        self.assertEqual(counts, {"billitem": 3, "expense": 2, "expensetemplate": 1, "category": 1})
+        self.assertEqual(
+            self.counts(user.pk),
+            {
+                "Category": 0,
+                "Expense": 0,
+                "BillItem": 0,
+                "ExpenseTemplate": 0,
+                # Kept without the category
+                "ImportMapping": 1,
+                # One for every deleted object, for sync clients
+                "DeletionRecord": 7,
+                "DataVersion": 1,
+            },
+        )
+        self.assertIsNone(ImportMapping.objects.get(user=user).default_category)
+        self.assertNotEqual(caching.get_data_version(user.pk), version)
+        self.assertEqual(self.counts(self.other.pk), self.other_counts)
+
+    def test_purge_user(self):
+        user = self.create_data("purge")
+        user_id = user.pk
+        purge_user_data(user, delete_user=True, chunk_size=2)
+        self.assertFalse(get_user_model().objects.filter(pk=user_id).exists())
+        self.assertEqual(set(self.counts(user_id).values()), {0})
+        self.assertEqual(self.counts(self.other.pk), self.other_counts)
+
+
+class DeletionRecordCompactionTests(TestCase):
+    def sync(self, user, last_sync: datetime.datetime) -> dict:
+        from expenses.views.api_sync import RunEndpoint
+
+        request = RequestFactory().post("/")
+        request.user = user
+        out, status = RunEndpoint().get_response(request, {"last_sync": last_sync.isoformat()})
+        self.assertEqual(status, 200)
+        return out
+
+    def test_compaction(self):
+        user = get_user_model().objects.create(username="compaction")
+        now = timezone.now()
+        for pk in range(1, 6):
+            DeletionRecord.objects.create(user=user, model="expense", object_pk=pk)
+        DeletionRecord.objects.filter(object_pk__lte=3).update(date=now - datetime.timedelta(days=400))
+        DeletionRecord.objects.filter(object_pk__gt=3).update(date=now - datetime.timedelta(days=1))
+        long_ago = now - datetime.timedelta(days=500)
+        recently = now - datetime.timedelta(days=2)
+
+        # Nothing was removed yet, so no client needs a full sync.
+        self.assertIsNone(get_cutoff())
+        out = self.sync(user, long_ago)
+        self.assertFalse(out["full_sync"])
+        self.assertEqual(len(out["deletions"]["new"]), 5)
+
+        horizon = now - datetime.timedelta(days=365)
+        progress = []
+        self.assertEqual(compact_deletion_records(horizon, chunk_size=2, progress=progress.append), 3)
+        self.assertEqual(progress, [2, 3])
+        self.assertEqual(sorted(DeletionRecord.objects.values_list("object_pk", flat=True)), [4, 5])
+        self.assertEqual(get_cutoff(), horizon)
+
+        out = self.sync(user, long_ago)
+        self.assertTrue(out["full_sync"])
+        self.assertEqual(out["deletions"]["new"], [])
+        out = self.sync(user, recently)
+        self.assertFalse(out["full_sync"])
+        self.assertEqual(sorted(d["id"] for d in out["deletions"]["new"]), [4, 5])
+
+        # A compaction with an earlier horizon does not move the cutoff back.
+        compact_deletion_records(horizon - datetime.timedelta(days=30))
+        self.assertEqual(get_cutoff(), horizon)
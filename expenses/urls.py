@@ -3,6 +3,8 @@
 # All rights reserved.
 # See /LICENSE for licensing information.
 
+import importlib
+
 from django.urls import path
 from django.views.decorators.cache import cache_page
 from django.views.i18n import JavaScriptCatalog
@@ -11,7 +13,6 @@ import expenses.views.bill
 import expenses.views.bill_item
 import expenses.views.category
 import expenses.views.expense
-import expenses.views.reports
 import expenses.views.search
 import expenses.views.template
 import expenses.views.api_autocomplete
@@ -21,9 +22,35 @@ from expenses import views
 
 from django.conf import settings
 
+
+class LazyView:
+    """A view that is imported on its first request.
+
+    Used for views with expensive dependencies (the report framework, the
+    sync API), so that processes which never serve them do not import them.
+    """
+
+    def __init__(self, module: str, name: str, csrf_exempt: bool = False):
+        self.module = module
+        self.name = name
+        # CsrfViewMiddleware checks this before the view is called (and imported).
+        self.csrf_exempt = csrf_exempt
+        self._view = None
+
+    def __call__(self, request, *args, **kwargs):
+        if self._view is None:
+            view = getattr(importlib.import_module(self.module), self.name)
+            self._view = view.as_view() if isinstance(view, type) else view
+        return self._view(request, *args, **kwargs)
+
+    def __repr__(self):
+        return f"<LazyView {self.module}.{self.name}>"
+
+
 app_name = "expenses"
 urlpatterns = [
     path("", views.index, name="index"),
+    path("dashboard/<slug:widget>/", views.dashboard_widget, name="dashboard_widget"),
     path(
         "jsi18n/",
         cache_page(86400, key_prefix="jsi18n")(JavaScriptCatalog.as_view(packages=["expenses"])),
@@ -32,6 +59,8 @@ urlpatterns = [
     path("search/", expenses.views.search.search, name="search"),
     path("expenses/", views.expense.expense_list, name="expense_list"),
     path("expenses/add/", views.expense.expense_add, name="expense_add"),
+    path("expenses/import/", views.expense.expense_import, name="expense_import"),
+    path("expenses/export/", views.expense.expense_export, name="expense_export"),
     path("expenses/<int:pk>/", views.expense.expense_show, name="expense_show"),
     path("expenses/<int:pk>/edit/", views.expense.expense_edit, name="expense_edit"),
     path("expenses/<int:pk>/convert/", views.expense.expense_convert, name="expense_convert"),
@@ -60,9 +89,20 @@ urlpatterns = [
     path("bills/<int:pk>/delete/", views.bill.BillDelete.as_view(), name="bill_delete"),
     path("bills/<int:bill_pk>/item/<int:item_pk>/", views.bill_item.bill_item_edit, name="bill_item_edit"),
     path("bills/<int:bill_pk>/item/<int:item_pk>/delete/", views.bill_item.bill_item_delete, name="bill_item_delete"),
-    path("reports/", views.reports.report_list, name="report_list"),
-    path("reports/<slug:slug>/", views.reports.report_setup, name="report_setup"),
-    path("reports/<slug:slug>/run/", views.reports.report_run, name="report_run"),
+    path("reports/", LazyView("expenses.views.reports", "report_list"), name="report_list"),
+    path(
+        "reports/dashboards/<slug:slug>/",
+        LazyView("expenses.views.reports", "report_dashboard"),
+        name="report_dashboard",
+    ),
+    path("reports/<slug:slug>/", LazyView("expenses.views.reports", "report_setup"), name="report_setup"),
+    path("reports/<slug:slug>/run/", LazyView("expenses.views.reports", "report_run"), name="report_run"),
+    path("reports/jobs/<slug:job_id>/", LazyView("expenses.views.reports", "report_job"), name="report_job"),
+    path(
+        "reports/jobs/<slug:job_id>/download/",
+        LazyView("expenses.views.reports", "report_job_download"),
+        name="report_job_download",
+    ),
     path(
         "api/autocomplete/expense/vendor/",
         views.api_autocomplete.expense_vendor,
@@ -80,14 +120,24 @@ urlpatterns = [
 ]
 
 if settings.EXPENSES_SYNC_API_ENABLED:
-    import expenses.views.api_sync
     urlpatterns += [
-        path("api/sync/hello/", views.api_sync.hello, name="api_sync__hello"),
-        path("api/sync/profile/", views.api_sync.profile, name="api_sync__profile"),
-        path("api/sync/run/", views.api_sync.RunEndpoint.as_view(), name="api_sync__run"),
-        path("api/sync/category/add/", views.api_sync.CategoryAddEndpoint.as_view(), name="api_sync__category_add"),
-        path("api/sync/category/edit/", views.api_sync.CategoryEditEndpoint.as_view(), name="api_sync__category_edit"),
+        path("api/sync/hello/", LazyView("expenses.views.api_sync", "hello"), name="api_sync__hello"),
+        path("api/sync/profile/", LazyView("expenses.views.api_sync", "profile"), name="api_sync__profile"),
+        path("api/sync/version/", LazyView("expenses.views.api_sync", "version"), name="api_sync__version"),
+        path("api/sync/run/", LazyView("expenses.views.api_sync", "RunEndpoint", True), name="api_sync__run"),
+        path(
+            "api/sync/category/add/",
+            LazyView("expenses.views.api_sync", "CategoryAddEndpoint", True),
+            name="api_sync__category_add",
+        ),
+        path(
+            "api/sync/category/edit/",
+            LazyView("expenses.views.api_sync", "CategoryEditEndpoint", True),
+            name="api_sync__category_edit",
+        ),
         path(
-            "api/sync/category/delete/", views.api_sync.CategoryDeleteEndpoint.as_view(), name="api_sync__category_delete"
+            "api/sync/category/delete/",
+            LazyView("expenses.views.api_sync", "CategoryDeleteEndpoint", True),
+            name="api_sync__category_delete",
         ),
     ]
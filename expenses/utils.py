@@ -5,31 +5,57 @@
 
 """Assorted Expenses utilities."""
 
-import babel.numbers
 import datetime
 import decimal
-import iso8601
+import functools
 import itertools
 import typing
 from django.utils import timezone
 from django.conf import settings
 from django.utils.translation import get_language
 
+if typing.TYPE_CHECKING:
+    import babel
+
+
+class MoneyFormatter:
+    """Formatter for money and numbers, with the Babel locale and patterns resolved once."""
+
+    def __init__(self, locale_name: str, currency_code: str):
+        self.locale = parse_babel_locale(locale_name)
+        self.currency_code = currency_code
+        self.currency_pattern = self.locale.currency_formats["standard"]
+        self.decimal_pattern = self.locale.decimal_formats[None]
+
+    def format_money(self, amount: typing.Union[int, float, decimal.Decimal]) -> str:
+        return self.currency_pattern.apply(amount, self.locale, currency=self.currency_code, currency_digits=True)
+
+    def format_number(self, amount: typing.Union[int, float, decimal.Decimal]) -> str:
+        return self.decimal_pattern.apply(amount, self.locale)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_money_formatter(locale_name: str, currency_code: str) -> MoneyFormatter:
+    return MoneyFormatter(locale_name, currency_code)
+
+
+def get_money_formatter() -> MoneyFormatter:
+    """Get the shared formatter for the configured currency and locale."""
+    return _get_money_formatter(settings.EXPENSES_CURRENCY_LOCALE, settings.EXPENSES_CURRENCY_CODE)
+
 
 def format_money(amount: typing.Union[int, float, decimal.Decimal]) -> str:
     """Format an amount of money for display."""
     if amount is None:
         amount = 0
-    return babel.numbers.format_currency(
-        amount, settings.EXPENSES_CURRENCY_CODE, locale=settings.EXPENSES_CURRENCY_LOCALE
-    )
+    return get_money_formatter().format_money(amount)
 
 
 def format_number(amount: typing.Union[int, float, decimal.Decimal], decimal_places: int) -> str:
     """Format an amount of money for display."""
     if amount is None:
         amount = 0
-    return babel.numbers.format_decimal(round(amount, decimal_places), locale=settings.EXPENSES_CURRENCY_LOCALE)
+    return get_money_formatter().format_number(round(amount, decimal_places))
 
 
 def today_date() -> datetime.date:
@@ -69,11 +95,15 @@ def serialize_decimal(amount: decimal.Decimal) -> str:
 
 def parse_date(date_str: str) -> datetime.date:
     """Parse an ISO 8601 date."""
+    import iso8601
+
     return iso8601.parse_date(date_str).date()
 
 
 def parse_dt(dt_str: str) -> datetime.datetime:
     """Parse an ISO 8601 datetime."""
+    import iso8601
+
     return iso8601.parse_date(dt_str)
 
 
@@ -89,7 +119,7 @@ def parse_amount_input(amount_str: str) -> typing.Optional[decimal.Decimal]:
     except decimal.InvalidOperation:
         try:
             return decimal.Decimal(amount_str.replace(",", "."))
-        except ValueError:
+        except decimal.InvalidOperation:
             return None
 
 
@@ -101,6 +131,16 @@ def get_babel_locale() -> str:
     return f"{lang}_{region.upper()}"
 
 
+@functools.lru_cache(maxsize=None)
+def parse_babel_locale(locale_name: str) -> "babel.Locale":
+    """Parse a babel locale name, reusing the result."""
+    # Babel is imported on first use, as it is slow to import.
+    import babel
+    import babel.numbers  # NOQA (needed for number patterns)
+
+    return babel.Locale.parse(locale_name)
+
+
 T = typing.TypeVar("T")
 
 
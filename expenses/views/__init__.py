@@ -5,31 +5,35 @@
 
 """Generic views."""
 
-import pygal
-import pygal.style
+import datetime
+import functools
+import hashlib
+import typing
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.db import connection
-from django.db.models import Sum
-from django.http import HttpResponseRedirect
+from django.db.models import Q, Sum
+from django.http import Http404, HttpResponseRedirect
 from django.shortcuts import render
-from django.utils.html import mark_safe
+from django.utils.cache import patch_cache_control
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic.edit import DeleteView
 from django.urls import reverse
 
-from expenses.utils import format_money, today_date, revchron
-from expenses.models import Expense, Category
-from django.utils.translation import gettext as _
+from expenses.charts import render_pie_chart
+from expenses.caching import DEFAULT_TIMEOUT, get_data_version, versioned_key
+from expenses.category_registry import get_category
+from expenses.utils import today_date, revchron
+from expenses.models import Expense
+from django.utils.translation import get_language, gettext as _
 
 
-@login_required
-def index(request):
-    last_n_expenses = revchron(Expense.objects.filter(user=request.user).select_related("category"))[
-        : settings.EXPENSES_INDEX_COUNT
-    ]
+def compute_last_3_days(user, today: datetime.date) -> dict:
+    """Compute spending in the last 3 days with expenses."""
     with connection.cursor() as cursor:
         cursor.execute(
             """
@@ -39,55 +43,127 @@ def index(request):
             GROUP BY date
             ORDER BY date DESC
             LIMIT 3""",
-            [request.user.pk],
+            [user.pk],
         )
         last_3_days = cursor.fetchall()
-    last_3_days_sum = sum(r[1] for r in last_3_days)
-    last_3_days = reversed(last_3_days)
-
-    today = today_date()
-    prev_month = today.month - 1
-    prev_year = today.year
-    while prev_month < 0:
-        prev_month += 12
-        prev_year -= 1
-
-    current_months_total = Expense.objects.filter(
-        user=request.user, date__year=today.year, date__month=today.month
-    ).aggregate(Sum("amount"))["amount__sum"]
-    previous_months_total = (
-        Expense.objects.filter(user=request.user, date__year=prev_year, date__month=prev_month).aggregate(
-            Sum("amount")
-        )["amount__sum"]
-        or 0
-    )
+    last_3_days.reverse()
+    return {"last_3_days": last_3_days, "last_3_days_sum": sum(r[1] for r in last_3_days)}
 
-    spending_per_category_qs = (
-        Expense.objects.filter(user=request.user).values("category").annotate(sum=Sum("amount")).order_by("-sum")
-    )
-    categories = {cat.pk: cat for cat in Category.objects.filter(user=request.user)}
-    spending_per_category = [(categories[i["category"]], i["sum"]) for i in spending_per_category_qs]
-
-    pie_chart = pygal.Pie(
-        disable_xml_declaration=True,
-        margin=0,
-        legend_at_bottom=True,
-        print_values=True,
-        print_labels=True,
-        style=pygal.style.DefaultStyle(
-            plot_background="white",
-            background="white",
-            font_family="var(--font-family-sans-serif)",
-            label_font_size=20,
-            value_font_size=20,
-            value_label_font_size=20,
-            tooltip_font_size=20,
-            legend_font_size=20,
-        ),
+
+def compute_category_stats(user, today: datetime.date) -> dict:
+    """Compute monthly totals and spending per category in a single grouped query."""
+    current_month = today.replace(day=1)
+    previous_month = (current_month - datetime.timedelta(days=1)).replace(day=1)
+    next_month = (current_month + datetime.timedelta(days=31)).replace(day=1)
+
+    per_category = (
+        Expense.objects.filter(user=user)
+        .values("category")
+        .annotate(
+            sum=Sum("amount"),
+            current=Sum("amount", filter=Q(date__gte=current_month, date__lt=next_month)),
+            previous=Sum("amount", filter=Q(date__gte=previous_month, date__lt=current_month)),
+        )
+        .order_by("-sum")
     )
-    for c, s in spending_per_category:
-        pie_chart.add(c.name, float(s), formatter=format_money)
-    category_chart = mark_safe(pie_chart.render())
+    spending_per_category = []
+    current_months_total = None
+    previous_months_total = 0
+    for row in per_category:
+        spending_per_category.append((get_category(user, row["category"]), row["sum"]))
+        if row["current"] is not None:
+            current_months_total = (current_months_total or 0) + row["current"]
+        if row["previous"] is not None:
+            previous_months_total += row["previous"]
+
+    return {
+        "current_months_total": current_months_total,
+        "previous_months_total": previous_months_total,
+        "spending_per_category": spending_per_category,
+    }
+
+
+def compute_category_chart(user, today: datetime.date) -> dict:
+    """Compute spending per category with its chart."""
+    stats = get_dashboard_data(compute_category_stats, user, today)
+    return {
+        "spending_per_category": stats["spending_per_category"],
+        "category_chart": render_pie_chart((c.name, s) for c, s in stats["spending_per_category"]),
+    }
+
+
+def get_dashboard_data(compute, user, today: datetime.date) -> dict:
+    """Get dashboard data of a user, computing it only after the user’s data changes."""
+    key = versioned_key("expenses_dashboard_" + compute.__name__, user.pk, today.isoformat())
+    data = cache.get(key)
+    if data is None:
+        data = compute(user, today)
+        cache.set(key, data, getattr(settings, "EXPENSES_CACHE_TIMEOUT", DEFAULT_TIMEOUT))
+    return data
+
+
+# Widget name: (template, data function, max age in seconds)
+DASHBOARD_WIDGETS = {
+    "last_3_days": ("expenses/dashboard/last_3_days.html", compute_last_3_days, 3600),
+    "month_totals": ("expenses/dashboard/month_totals.html", compute_category_stats, 3600),
+    "categories": ("expenses/dashboard/categories.html", compute_category_chart, 86400),
+}
+
+
+def get_dashboard_token(user) -> str:
+    """Get a token that changes whenever the dashboard widgets of a user change."""
+    return "{}-{}".format(get_data_version(user.pk), today_date().isoformat())
+
+
+def dashboard_widget_etag(request, widget: str) -> typing.Optional[str]:
+    if widget not in DASHBOARD_WIDGETS:
+        return None
+    return "{}-{}-{}".format(widget, get_dashboard_token(request.user), get_language())
+
+
+def user_page_etag(request, *args, **kwargs) -> typing.Optional[str]:
+    """Get an ETag for a page that depends only on the user’s data.
+
+    Pages include a CSRF token, so the ETag changes with the session and the
+    CSRF cookie. Pages with pending messages are not cached.
+    """
+    if not request.user.is_authenticated or len(messages.get_messages(request)):
+        return None
+    session = request.session.session_key or ""
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    session_hash = hashlib.md5(f"{session}:{csrf_cookie}".encode("utf-8")).hexdigest()[:12]
+    return "{}-{}-{}".format(get_dashboard_token(request.user), get_language(), session_hash)
+
+
+def conditional_page(view):
+    """Answer conditional GET requests with 304 Not Modified until the user’s data changes."""
+    conditional_view = condition(etag_func=user_page_etag)(view)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            # condition() would answer a POST with a matching ETag with 412 Precondition Failed.
+            return view(request, *args, **kwargs)
+        response = conditional_view(request, *args, **kwargs)
+        if response.status_code != 200:
+            # Redirects and errors do not depend on the data version.
+            if response.status_code != 304 and response.has_header("ETag"):
+                del response["ETag"]
+        elif response.has_header("ETag"):
+            # Browsers must revalidate the page every time.
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
+
+
+@login_required
+@conditional_page
+def index(request):
+    last_n_expenses = revchron(Expense.objects.filter(user=request.user).select_related("category"))[
+        : settings.EXPENSES_INDEX_COUNT
+    ]
+    dashboard_token = get_dashboard_token(request.user)
 
     return render(
         request,
@@ -97,16 +173,31 @@ def index(request):
             "pid": "expenses_index",
             "last_n_expenses": last_n_expenses,
             "EXPENSES_INDEX_COUNT": settings.EXPENSES_INDEX_COUNT,
-            "last_3_days": last_3_days,
-            "last_3_days_sum": last_3_days_sum,
-            "current_months_total": current_months_total,
-            "previous_months_total": previous_months_total,
-            "spending_per_category": spending_per_category,
-            "category_chart": category_chart,
+            "dashboard_widgets": [
+                (reverse("expenses:dashboard_widget", args=[widget]) + "?v=" + dashboard_token)
+                for widget in ("month_totals", "last_3_days", "categories")
+            ],
         },
     )
 
 
+@login_required
+@condition(etag_func=dashboard_widget_etag)
+def dashboard_widget(request, widget: str):
+    """Render a single dashboard widget.
+
+    Widget URLs include a token that changes with the user’s data, so
+    browsers can keep the responses for the widget’s max age.
+    """
+    if widget not in DASHBOARD_WIDGETS:
+        raise Http404(_("Unknown dashboard widget"))
+    template, compute, max_age = DASHBOARD_WIDGETS[widget]
+    data = get_dashboard_data(compute, request.user, today_date())
+    response = render(request, template, data)
+    patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
 @method_decorator(login_required, name="dispatch")
 class ExpDeleteView(DeleteView):
     template_name = "expenses/exp_confirm_delete.html"
@@ -7,6 +7,7 @@
 
 import json
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from django.http import JsonResponse
 from django.urls import reverse
 from django.utils import timezone
@@ -15,6 +16,8 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from oauth2_provider.decorators import protected_resource
 
+from expenses.caching import batch_data_version_bumps, get_data_version
+from expenses.deletion_records import get_cutoff
 from expenses.models import Category, DeletionRecord, DATA_MODELS, STR_TO_DATA_MODEL_MAP
 from expenses.utils import parse_dt
 
@@ -39,13 +42,25 @@ class PostJsonEndpoint(View):
         except json.JSONDecodeError:
             return JsonResponse({"error": "POST data must be JSON"}, status=400)
 
-        out, status = self.get_response(request, req_data)
+        # Endpoints make many writes, commit them (and their signal side effects) at once.
+        with transaction.atomic(), batch_data_version_bumps():
+            out, status = self.get_response(request, req_data)
         return JsonResponse(out, status=status)
 
     def get_response(self, request, req_data: dict) -> (dict, int):
         raise NotImplementedError()
 
 
+@protected_resource()
+def version(request):
+    """Get the version of the user’s data, which changes whenever the data changes.
+
+    Clients can compare it with the data_version of their last sync to skip
+    syncs when nothing changed.
+    """
+    return JsonResponse({"data_version": get_data_version(request.user.pk)})
+
+
 @protected_resource()
 def profile(request):
     return JsonResponse(
@@ -60,10 +75,13 @@ def profile(request):
 #           "deletions": [{"model": str, "id": int}]
 #           "changes": {"expense": […], "billitem": […], "expensetemplate": […]}
 #          }
-# Output: {"sync_date": str,
+# Output: {"sync_date": str, "data_version": int, "full_sync": bool,
 #          "deletions": {new|ack|not_found: […]},
 #          "changes": {"new": {model: [data]},
 #                      "ack": {model: [{"local_id": int, "id": int}]}}
+# If full_sync is true, changes.new contains all data, and deletions.new is
+# empty, because deletion records since the last sync may have been removed
+# (see expenses.deletion_records). Clients should replace their local data.
 class RunEndpoint(PostJsonEndpoint):
     def get_response(self, request, req_data: dict):
         if "sync_date" in req_data:
@@ -72,6 +90,7 @@ class RunEndpoint(PostJsonEndpoint):
             now = timezone.now()
         out = {
             "sync_date": now.isoformat(),
+            "full_sync": False,
             "deletions": {
                 "new": [],
                 "ack": [],
@@ -91,17 +110,24 @@ class RunEndpoint(PostJsonEndpoint):
 
         if req_data["last_sync"] is None:
             # Initial sync, provide all data
+            out["full_sync"] = True
+            out["data_version"] = get_data_version(request.user.pk)
             for model, model_str in DATA_MODELS:
                 queryset = model.objects.filter(user=request.user, date_modified__lte=now).order_by("id")
                 out["changes"]["new"][model_str] = [o.to_json() for o in queryset]
             return out, 200
 
         last_sync = parse_dt(req_data["last_sync"])
-        # Find deletions
-        out["deletions"]["new"] = [
-            {"model": o.model, "id": o.object_pk}
-            for o in DeletionRecord.objects.filter(user=request.user, date__gt=last_sync, date__lte=now)
-        ]
+        cutoff = get_cutoff()
+        if cutoff is not None and last_sync < cutoff:
+            # Deletions since the last sync may be gone, send all data after handling the client’s changes
+            out["full_sync"] = True
+        else:
+            # Find deletions
+            out["deletions"]["new"] = [
+                {"model": o.model, "id": o.object_pk}
+                for o in DeletionRecord.objects.filter(user=request.user, date__gt=last_sync, date__lte=now)
+            ]
 
         # And handle provided deletions
         for deletion in req_data.get("deletions", {}):
@@ -143,10 +169,11 @@ class RunEndpoint(PostJsonEndpoint):
                 out["changes"]["ack"][model_str].append({"local_id": change["local_id"], "id": obj.pk})
 
         # And give them our new data
+        out["data_version"] = get_data_version(request.user.pk)
         for model, model_str in DATA_MODELS:
-            queryset = model.objects.filter(
-                user=request.user, date_modified__gt=last_sync, date_modified__lte=now
-            ).order_by("id")
+            queryset = model.objects.filter(user=request.user, date_modified__lte=now).order_by("id")
+            if not out["full_sync"]:
+                queryset = queryset.filter(date_modified__gt=last_sync)
             out["changes"]["new"][model_str] = [o.to_json() for o in queryset]
 
         return out, 200
@@ -179,7 +206,5 @@ class CategoryDeleteEndpoint(PostJsonEndpoint):
         except (KeyError, Category.DoesNotExist):
             return {"success": False, "error": "Bad request data."}, 400
 
-        prep_success = cat.prepare_deletion(req_data["move_destination"], request.user)
-        if prep_success:
-            cat.delete()
-        return {"success": prep_success}, 200 if prep_success else 500
+        success = cat.merge_into(req_data.get("move_destination"))
+        return {"success": success}, 200 if success else 500
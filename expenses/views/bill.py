@@ -7,7 +7,7 @@
 
 import collections
 
-from django.db import connection
+from django.db import connection, transaction
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseRedirect, HttpResponseNotAllowed, HttpResponseBadRequest
@@ -15,9 +15,10 @@ from django.shortcuts import render, get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.utils.translation import gettext as _, ngettext
 
+from expenses.caching import batch_data_version_bumps
 from expenses.forms import BillForm
 from expenses.models import Expense, BillItem
-from expenses.views import ExpDeleteView
+from expenses.views import ExpDeleteView, conditional_page
 from expenses.views.expense import expense_list as _expense_list
 
 
@@ -26,7 +27,7 @@ SELECT "vendor", "category_id", "category_name" FROM (
     SELECT "vendor", "category_id", "category_name" FROM (
         SELECT "vendor", "category_id", "expenses_category"."name" AS "category_name" FROM "expenses_expense"
         INNER JOIN "expenses_category" ON ("category_id" = "expenses_category"."id")
-        WHERE "is_bill" = true AND "expenses_expense"."user_id" = %s
+        WHERE "is_bill" AND "expenses_expense"."user_id" = %s
         ORDER BY "expenses_expense"."date_added" DESC
         LIMIT 15
     ) source
@@ -118,6 +119,7 @@ def bill_editmeta(request, pk):
 
 
 @login_required
+@conditional_page
 def bill_show(request, pk):
     expense = get_object_or_404(Expense, pk=pk, user=request.user)
     if not expense.is_bill:
@@ -142,29 +144,31 @@ def bill_show(request, pk):
         ok = 0
         err = 0
 
-        # Add/edit
-        for pk, values in add_edit.items():
-            try:
-                if pk.startswith("a"):
-                    bi = BillItem()
-                else:
-                    bi = BillItem.objects.get(pk=int(pk), user=request.user)
-                for k, v in values.items():
-                    setattr(bi, k, v)
-                bi.user = request.user
-                bi.bill = expense
-                bi.save()
-                ok += 1
-            except BillItem.DoesNotExist:
-                err += 1
-
-        for pk in delete:
-            try:
-                bi = BillItem.objects.get(pk=pk, user=request.user)
-                bi.delete()
-                ok += 1
-            except BillItem.DoesNotExist:
-                err += 1
+        # Every item save also updates the bill, commit them all at once.
+        with transaction.atomic(), batch_data_version_bumps():
+            # Add/edit
+            for pk, values in add_edit.items():
+                try:
+                    if pk.startswith("a"):
+                        bi = BillItem()
+                    else:
+                        bi = BillItem.objects.get(pk=int(pk), user=request.user)
+                    for k, v in values.items():
+                        setattr(bi, k, v)
+                    bi.user = request.user
+                    bi.bill = expense
+                    bi.save()
+                    ok += 1
+                except BillItem.DoesNotExist:
+                    err += 1
+
+            for pk in delete:
+                try:
+                    bi = BillItem.objects.get(pk=pk, user=request.user)
+                    bi.delete()
+                    ok += 1
+                except BillItem.DoesNotExist:
+                    err += 1
 
         status_msgs = []
         if ok:
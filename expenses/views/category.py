@@ -7,22 +7,28 @@
 
 from collections import defaultdict
 from django.conf import settings
+from django.db import transaction
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.http import HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
+from expenses.caching import batch_data_version_bumps, bump_data_version
+from expenses.category_registry import get_category_registry, invalidate_category_registry
 from expenses.forms import CategoryForm
-from expenses.models import Category, Expense, ExpenseTemplate
-from expenses.utils import revchron
+from expenses.keyset import EXPENSE_ORDERING, KeysetPaginator
+from expenses.models import Category, Expense, ExpenseTemplate, assign_slugs
+from expenses.views import conditional_page
 
 
 @login_required
+@conditional_page
 def category_list(request):
-    paginator = Paginator(Category.user_objects(request), settings.EXPENSES_PAGE_SIZE)
+    paginator = Paginator(get_category_registry(request.user).categories, settings.EXPENSES_PAGE_SIZE)
     page = request.GET.get("page")
     categories = paginator.get_page(page)
     return render(
@@ -37,14 +43,18 @@ def category_list(request):
 
 
 @login_required
+@conditional_page
 def category_show(request, slug):
     category = get_object_or_404(Category, slug=slug, user=request.user)
-    paginator = Paginator(
-        revchron(Expense.objects.filter(user=request.user, category=category).select_related("category")),
+    paginator = KeysetPaginator(
+        Expense.objects.filter(user=request.user, category=category),
+        EXPENSE_ORDERING,
         settings.EXPENSES_PAGE_SIZE,
+        request.user.pk,
+        f"category_show:{category.pk}",
     )
     page = request.GET.get("page")
-    expenses = paginator.get_page(page)
+    expenses = paginator.get_page(page, request.GET.get("cursor"))
     title = "{} {}".format(_("Category:"), category.name)
     return render(
         request,
@@ -60,16 +70,18 @@ def category_show(request, slug):
 
 
 @login_required
+@conditional_page
 def category_show_templates(request, slug):
     category = get_object_or_404(Category, slug=slug, user=request.user)
-    paginator = Paginator(
-        ExpenseTemplate.objects.filter(user=request.user, category=category)
-        .order_by("-date_added")
-        .select_related("category"),
+    paginator = KeysetPaginator(
+        ExpenseTemplate.objects.filter(user=request.user, category=category),
+        ("-date_added", "-id"),
         settings.EXPENSES_PAGE_SIZE,
+        request.user.pk,
+        f"category_show_templates:{category.pk}",
     )
     page = request.GET.get("page")
-    templates = paginator.get_page(page)
+    templates = paginator.get_page(page, request.GET.get("cursor"))
     title = "{} {}".format(_("Category:"), category.name)
     return render(
         request,
@@ -137,18 +149,15 @@ def category_delete(request, slug):
     category = get_object_or_404(Category, slug=slug, user=request.user)
     move_succeeded = True
     if request.method == "POST":
-        if category.total_count != 0:
-            dest = request.POST.get("move_destination")
-            move_succeeded = category.prepare_deletion(dest, request.user)
-
+        move_succeeded = category.merge_into(request.POST.get("move_destination"))
         if move_succeeded:
-            category.delete()
             messages.add_message(request, messages.SUCCESS, _("%s has been deleted.") % category.name)
             return HttpResponseRedirect(reverse("expenses:category_list"))
 
-    categories = Category.user_objects(request)
+    categories = get_category_registry(request.user).categories
+    total_count = category.total_count
     show_del_button = True
-    if categories.count == 1 and category.total_count > 0:
+    if len(categories) == 1 and total_count > 0:
         show_del_button = False
 
     return render(
@@ -156,6 +165,7 @@ def category_delete(request, slug):
         "expenses/category_delete.html",
         {
             "object": category,
+            "total_count": total_count,
             "deletion_failed": not move_succeeded,
             "htmltitle": _("Delete category %s") % category.name,
             "pid": "category_delete",
@@ -169,11 +179,14 @@ def category_delete(request, slug):
 def category_bulk_edit(request):
     categories = Category.user_objects(request)
     if request.method == "POST":
+        categories = list(categories)
         added_count = 0
         changed_count = 0
         unchanged_count = 0
         failure_count = 0
         failure_list = []
+        changed = []
+        added = []
 
         for cat in categories:
             prefix = "cat_{}_".format(cat.pk)
@@ -185,7 +198,7 @@ def category_bulk_edit(request):
                 if cat.name != new_name or cat.order != new_order:
                     cat.name = new_name
                     cat.order = new_order
-                    cat.save()
+                    changed.append(cat)
                     changed_count += 1
                 else:
                     unchanged_count += 1
@@ -194,10 +207,8 @@ def category_bulk_edit(request):
                 failure_list.append(cat.name)
 
         additions = defaultdict(dict)
-        print(request.POST)
         for k, v in request.POST.items():
             if k.startswith("add_"):
-                print(k, v)
                 _add, aid, key = k.split("_")
                 additions[aid][key] = v
 
@@ -205,16 +216,25 @@ def category_bulk_edit(request):
             new_name = fields.get("name")
             new_order = fields.get("order")
             if new_name and new_order and new_order.isnumeric():
-                c = Category()
-                c.name = new_name
-                c.order = new_order
-                c.user = request.user
-                c.save()
+                added.append(Category(name=new_name, order=int(new_order), user=request.user))
                 added_count += 1
             else:
                 failure_count += 1
                 failure_list.append("+{}/{}".format(new_name, new_order))
 
+        # Slugs are assigned in the same order as if every category was saved on its own.
+        assign_slugs(changed + added, categories)
+        now = timezone.now()
+        for cat in changed:
+            cat.date_modified = now
+        with transaction.atomic(), batch_data_version_bumps():
+            if changed:
+                Category.objects.bulk_update(changed, ["name", "order", "slug", "slugbase", "date_modified"])
+                bump_data_version(request.user.pk)
+            Category.objects.bulk_create(added)
+        if changed or added:
+            invalidate_category_registry(request.user.pk, request.user)
+
         return render(
             request,
             "expenses/category_bulk_edit_results.html",
@@ -8,21 +8,27 @@
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.http import HttpResponseRedirect
+from django.db import transaction
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.utils.translation import gettext as _
 
-from expenses.forms import ExpenseForm
-from expenses.models import Expense, BillItem, Category
-from expenses.utils import revchron, today_date
-from expenses.views import ExpDeleteView
+from expenses.backup import export_archive
+from expenses.caching import batch_data_version_bumps
+from expenses.category_registry import get_category_registry
+from expenses.forms import ExpenseForm, ImportForm
+from expenses.imports import ImportFileError, import_expenses
+from expenses.keyset import EXPENSE_ORDERING, KeysetPaginator
+from expenses.models import Expense, BillItem, ImportMapping
+from expenses.utils import today_date
+from expenses.views import ExpDeleteView, conditional_page
 
 
 @login_required
+@conditional_page
 def expense_list(request, bills_only=False):
-    exp = revchron(Expense.objects.filter(user=request.user).select_related("category"))
+    exp = Expense.objects.filter(user=request.user)
     if bills_only:
         exp = exp.filter(is_bill=True)
         htmltitle = _("Bills")
@@ -31,12 +37,12 @@ def expense_list(request, bills_only=False):
         htmltitle = _("Expenses")
         pid = "expense_list"
 
-    paginator = Paginator(exp, settings.EXPENSES_PAGE_SIZE)
+    paginator = KeysetPaginator(exp, EXPENSE_ORDERING, settings.EXPENSES_PAGE_SIZE, request.user.pk, pid)
     page = request.GET.get("page", "1")
-    expenses = paginator.get_page(page)
+    expenses = paginator.get_page(page, request.GET.get("cursor"))
     if page == "1" and not bills_only:
         show_form = True
-        categories = Category.user_objects(request)
+        categories = get_category_registry(request.user).categories
     else:
         show_form = False
         categories = None
@@ -80,6 +86,49 @@ def expense_add(request):
 
 
 @login_required
+def expense_import(request):
+    mapping = ImportMapping.objects.filter(user=request.user).first() or ImportMapping(user=request.user)
+    form = ImportForm(instance=mapping, user=request.user)
+    if request.method == "POST":
+        form = ImportForm(request.POST, request.FILES, instance=mapping, user=request.user)
+        if form.is_valid():
+            mapping = form.save()
+            try:
+                result = import_expenses(request.user, form.cleaned_data["file"], mapping)
+            except ImportFileError as exc:
+                form.add_error("file", str(exc))
+            else:
+                return render(
+                    request,
+                    "expenses/expense_import_results.html",
+                    {
+                        "htmltitle": _("Import results"),
+                        "pid": "expense_import",
+                        "result": result,
+                    },
+                )
+
+    return render(
+        request,
+        "expenses/expense_import.html",
+        {
+            "htmltitle": _("Import expenses"),
+            "pid": "expense_import",
+            "form": form,
+        },
+    )
+
+
+@login_required
+def expense_export(request):
+    response = StreamingHttpResponse(export_archive(request.user), content_type="application/zip")
+    filename = f'expenses-export-{today_date().strftime("%Y-%m-%d")}.zip'
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@conditional_page
 def expense_show(request, pk):
     expense = get_object_or_404(Expense, pk=pk, user=request.user)
     if expense.is_bill:
@@ -140,23 +189,25 @@ def expense_convert(request, pk):
     if request.method == "POST":
         amount = expense.amount  # the amount gets reset to 0 during the conversion
         if expense.is_bill:
-            expense.description = expense.desc_auto
-            expense.is_bill = False
-            expense.billitem_set.all().delete()
-            expense.amount = amount
-            expense.save()
+            with transaction.atomic(), batch_data_version_bumps():
+                expense.description = expense.desc_auto
+                expense.is_bill = False
+                expense.billitem_set.all().delete()
+                expense.amount = amount
+                expense.save()
             return HttpResponseRedirect(reverse("expenses:expense_show", args=[expense.pk]))
         else:
-            expense.is_bill = True
-            expense.save()
-            billitem = BillItem()
-            billitem.bill = expense
-            billitem.product = expense.description
-            billitem.serving = 1
-            billitem.count = 1
-            billitem.unit_price = amount
-            billitem.user = expense.user
-            billitem.save()
+            with transaction.atomic(), batch_data_version_bumps():
+                expense.is_bill = True
+                expense.save()
+                billitem = BillItem()
+                billitem.bill = expense
+                billitem.product = expense.description
+                billitem.serving = 1
+                billitem.count = 1
+                billitem.unit_price = amount
+                billitem.user = expense.user
+                billitem.save()
             return HttpResponseRedirect(reverse("expenses:bill_show", args=[expense.pk]))
 
     return render(
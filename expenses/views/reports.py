@@ -8,16 +8,23 @@
 import time
 import typing
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import SuspiciousOperation
-from django.http import HttpResponseNotFound, HttpRequest
+from django.http import Http404, HttpResponse, HttpResponseNotFound, HttpResponseRedirect, HttpRequest
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.html import mark_safe
 from django.utils.translation import gettext as _
 
+from expenses import report_jobs
+from expenses.category_registry import get_category_registry
 from expenses.reports import AVAILABLE_REPORTS, Option, OptionGroup, Report
+from expenses.views import conditional_page
 
 
 @login_required
+@conditional_page
 def report_list(request: HttpRequest):
     return render(
         request,
@@ -27,11 +34,15 @@ def report_list(request: HttpRequest):
             "pid": "report_list",
             # work around class attributes not picked up by Django templates
             "reports": [r.meta_to_dict() for r in AVAILABLE_REPORTS.values()],
+            "dashboards": [
+                {"slug": slug, "name": dashboard["name"]} for slug, dashboard in get_report_dashboards().items()
+            ],
         },
     )
 
 
 @login_required
+@conditional_page
 def report_setup(request: HttpRequest, slug: str):
     if slug not in AVAILABLE_REPORTS:
         return HttpResponseNotFound()
@@ -45,16 +56,17 @@ def report_setup(request: HttpRequest, slug: str):
             "pid": "report_setup",
             # work around class attributes not picked up by Django templates
             "report": report.meta_to_dict(),
+            "jobs_enabled": report_jobs.jobs_enabled(),
         },
     )
 
 
 def get_settings_from_post_data(
-    request: HttpRequest, options: typing.List[Option], group: OptionGroup
+    data: typing.Mapping[str, str], options: typing.List[Option], group: OptionGroup
 ) -> typing.Dict[Option, typing.Any]:
     values: typing.Dict[Option, typing.Any] = {}
     if group.type == "radio":
-        option_id_value = request.POST.get(group.option_id)
+        option_id_value = data.get(group.option_id)
         if not option_id_value:
             raise SuspiciousOperation("Invalid request (missing field value)")
         for opt in options:
@@ -62,12 +74,12 @@ def get_settings_from_post_data(
                 values[opt] = True
     elif group.type == "check":
         for opt in options:
-            if opt.option_id in request.POST:
+            if opt.option_id in data:
                 values[opt] = True
     else:
         for opt in options:
-            if opt.option_id in request.POST:
-                values[opt] = request.POST[opt.option_id]
+            if opt.option_id in data:
+                values[opt] = data[opt.option_id]
             elif opt.type == "text":
                 values[opt] = ""
             else:
@@ -78,27 +90,41 @@ def get_settings_from_post_data(
     return values
 
 
+def build_report(
+    report_class: typing.Type[Report], request: HttpRequest, data: typing.Mapping[str, str], categories=None
+) -> Report:
+    """Create a report from form-style data."""
+    report_settings: typing.Dict[Option, typing.Any] = {}
+
+    for opt in report_class.options:
+        report_settings.update(get_settings_from_post_data(data, opt.options, opt))
+
+    return report_class(request, report_settings, categories)
+
+
 @login_required
 def report_run(request, slug):
     if slug not in AVAILABLE_REPORTS:
         return HttpResponseNotFound()
 
     report_class: typing.Type[Report] = AVAILABLE_REPORTS[slug]
-    settings: typing.Dict[Option, typing.Any] = {}
-
-    for opt in report_class.options:
-        settings.update(get_settings_from_post_data(request, opt.options, opt))
-
-    report: Report = report_class(request, settings)
+    report: Report = build_report(report_class, request, request.POST)
 
     postfields: typing.List[(str, str)] = []
     output_format = "html"
+    run_in_background = False
     for k, v in request.POST.items():
         if k == "output_format":
             output_format = v
+        elif k == "run_in_background":
+            run_in_background = report_jobs.jobs_enabled()
         elif k != "csrfmiddlewaretoken":
             postfields.append((k, v))
 
+    if run_in_background:
+        job_id = report_jobs.submit_report(report, output_format, postfields)
+        return HttpResponseRedirect(reverse("expenses:report_job", args=[job_id]))
+
     if output_format == "print":
         template = "expenses/report_run_print.html"
     elif output_format == "csv":
@@ -123,3 +149,85 @@ def report_run(request, slug):
             "postfields": postfields,
         },
     )
+
+
+def _get_user_job(request: HttpRequest, job_id: str) -> dict:
+    job = report_jobs.get_job(job_id)
+    if job is None or job["user_id"] != request.user.pk:
+        raise Http404("Report job not found.")
+    return job
+
+
+@login_required
+def report_job(request: HttpRequest, job_id: str):
+    job = _get_user_job(request, job_id)
+    report_class: typing.Type[Report] = AVAILABLE_REPORTS[job["slug"]]
+    context = {
+        "htmltitle": report_class.name,
+        "pid": "report_run",
+        "report": report_class.meta_to_dict(),
+        "job": job,
+        "postfields": job["postfields"],
+        "time": job["time"],
+    }
+
+    if job["status"] == "done" and job["content_type"] == "text/html":
+        if job["output_format"] == "print":
+            template = "expenses/report_run_print.html"
+        else:
+            template = "expenses/report_run.html"
+        context["report_html"] = mark_safe(job["content"])
+        return render(request, template, context)
+
+    context["refresh_interval"] = 2
+    return render(request, "expenses/report_job.html", context)
+
+
+@login_required
+def report_job_download(request: HttpRequest, job_id: str):
+    job = _get_user_job(request, job_id)
+    if job["status"] != "done":
+        return HttpResponseRedirect(reverse("expenses:report_job", args=[job_id]))
+
+    response = HttpResponse(job["content"], content_type=job["content_type"])
+    if job["content_disposition"]:
+        response["Content-Disposition"] = job["content_disposition"]
+    return response
+
+
+def get_report_dashboards() -> typing.Dict[str, dict]:
+    return getattr(settings, "EXPENSES_REPORT_DASHBOARDS", {})
+
+
+@login_required
+def report_dashboard(request: HttpRequest, slug: str):
+    dashboards = get_report_dashboards()
+    if slug not in dashboards:
+        return HttpResponseNotFound()
+    dashboard = dashboards[slug]
+
+    # All reports share a single categories lookup.
+    categories = get_category_registry(request.user).categories
+    reports: typing.List[Report] = []
+    for report_slug, data in dashboard["reports"]:
+        if report_slug not in AVAILABLE_REPORTS:
+            return HttpResponseNotFound()
+        reports.append(build_report(AVAILABLE_REPORTS[report_slug], request, data, categories))
+
+    start_time = time.monotonic()
+    results = report_jobs.run_concurrently(reports)
+    end_time = time.monotonic()
+
+    return render(
+        request,
+        "expenses/report_dashboard.html",
+        {
+            "htmltitle": dashboard["name"],
+            "pid": "report_dashboard",
+            "results": [
+                {"report": report, "report_html": report_html, "time": report_time}
+                for report, (report_html, report_time) in zip(reports, results)
+            ],
+            "time": end_time - start_time,
+        },
+    )
@@ -11,8 +11,10 @@ from django.db import connection
 from django.shortcuts import render
 from django.utils.translation import gettext as _
 
-from expenses.models import Expense, BillItem, Category
+from expenses.category_registry import get_category_registry
+from expenses.models import Expense, BillItem
 from expenses.utils import dict_overwrite, revchron
+from expenses.views import conditional_page
 
 
 class RawQueryWithSlicing:
@@ -63,9 +65,10 @@ class RawQueryWithSlicing:
 
 
 @login_required
+@conditional_page
 def search(request):
     opt = {"q": "", "vendor": "", "search_for": "purchases", "date_spec": "any", "date_start": "", "date_end": ""}
-    categories = Category.user_objects(request)
+    categories = get_category_registry(request.user).categories
     if "q" in request.GET or "vendor" in request.GET:
         opt["has_query"] = True
         # Set search options (will be copied into template)
@@ -88,7 +91,7 @@ def search(request):
 
         # Do the search
         if opt["search_for"] == "expenses":
-            items = Expense.objects.filter(user=request.user, category__in=cat_pks).select_related("category")
+            items = Expense.objects.filter(user=request.user, category__in=cat_pks)
             if opt["q"]:
                 items = items.filter(description_cache__icontains=opt["q"])
             if opt["vendor"]:
@@ -25,6 +25,7 @@ setup(
         "Topic :: Office/Business :: Financial",
     ],
     packages=find_packages(),
-    install_requires=["Django>=3.0", "Babel", "pygal", "iso8601", "attrs"],
+    install_requires=["Django>=3.0", "Babel", "iso8601", "attrs"],
+    extras_require={"pygal": ["pygal"]},
     include_package_data=True,
 )
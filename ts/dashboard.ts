@@ -0,0 +1,27 @@
+/*
+ * Expenses Dashboard Widgets
+ * Copyright © 2018-2023, Chris Warrick. All rights reserved. License: 3-clause BSD.
+ */
+
+function loadWidget(widget: HTMLElement): Promise<void> {
+    return fetch(widget.dataset.url, { credentials: "same-origin" })
+        .then((response) => {
+            if (!response.ok) throw new Error(response.statusText);
+            return response.text();
+        })
+        .then((html) => {
+            widget.innerHTML = html;
+        })
+        .catch(() => {
+            widget.innerHTML = "";
+            let error = document.createElement("p");
+            error.className = "text-muted";
+            error.textContent = gettext("Could not load this section.");
+            widget.appendChild(error);
+        });
+}
+
+export default function loadDashboardWidgets() {
+    // Widgets are fetched in parallel, and each one is shown as soon as it arrives.
+    document.querySelectorAll<HTMLElement>(".expenses-dashboard-widget").forEach(loadWidget);
+}
@@ -4,6 +4,7 @@
  */
 import initializeBillEditor from "./billeditor";
 import initializeBulkCatEditor from "./bulkcateditor";
+import loadDashboardWidgets from "./dashboard";
 import initializeSearchForm from "./searchform";
 import initializeTemplateEditForm from "./templateedit";
 import setUpAutoComplete from "./autocomplete";
@@ -57,6 +58,12 @@ function onDocReady() {
         initializeSearchForm();
     }
 
+    // load dashboard widgets
+    let dashboardWidget = document.querySelector(".expenses-dashboard-widget");
+    if (dashboardWidget !== null) {
+        loadDashboardWidgets();
+    }
+
     // enable field enablers
     let fieldEnablers = document.querySelectorAll(".expenses-field-enabler");
     fieldEnablers.forEach((target: HTMLInputElement) => {